@@ -1,8 +1,19 @@
 """Candeo C-ZB-SR5BR Scene Switch Remote - 5 Button Rotary."""
 
 from __future__ import annotations
-from typing import Any, Optional, Union, Final
+from typing import Any, Optional, Union, Final, TYPE_CHECKING
+from array import array
+import asyncio
+import atexit
+from collections import deque
+from collections.abc import Callable
+import functools
+import inspect
+import json
 import logging
+import os
+import struct
+import time
 from zigpy.zcl import foundation
 from zigpy.quirks import CustomCluster, CustomDevice
 from zigpy.profiles import zha
@@ -36,6 +47,711 @@ from zhaquirks.const import (
 )
 import zigpy.types as t
 
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+_LOGGER = logging.getLogger(__name__)
+
+# Hot path debug logging is skipped entirely unless the device IEEE is listed
+# here ("*" enables every device). Listed devices log through this module's
+# logger, so one device can be debugged without enabling zigpy debug logging,
+# and keep the last TRACE_FRAMES decoded frames for dump_trace().
+DEBUG_DEVICES: Final[frozenset[str]] = frozenset()
+TRACE_FRAMES: Final = 32
+
+
+def _debug_enabled(cluster: CustomCluster) -> bool:
+    """return True when hot path debug logging is enabled for the cluster's device."""
+    return "*" in DEBUG_DEVICES or str(cluster.endpoint.device.ieee) in DEBUG_DEVICES
+
+
+def _trace_debug(cluster: CustomCluster, msg: str, *args: Any) -> None:
+    """log hot path debug message for a traced device."""
+    _LOGGER.debug(
+        "[%s:%s:0x%04x] " + msg,
+        cluster.endpoint.device.ieee,
+        cluster.endpoint.endpoint_id,
+        cluster.cluster_id,
+        *args,
+    )
+
+
+class _CandeoFrameTrace:
+    """_CandeoFrameTrace: preallocated ring buffer of the most recent decoded frames."""
+
+    __slots__ = ("_buffer", "_size", "_next", "_count")
+
+    # age timestamp, tsn, command id and the four command fields
+    record: Final = struct.Struct("<IBB4B")
+    fields: Final = ("tsn", "command_id", "field_1", "field_2", "field_3", "field_4")
+
+    def __init__(self, size: int):
+        """__init___"""
+        self._buffer = bytearray(self.record.size * size)
+        self._size = size
+        self._next = 0
+        self._count = 0
+
+    def add(self, *values: int) -> None:
+        """record a decoded frame, overwriting the oldest one when full."""
+        self.record.pack_into(
+            self._buffer,
+            self._next * self.record.size,
+            (time.monotonic_ns() // 1_000_000) & 0xFFFFFFFF,
+            *values,
+        )
+        self._next = (self._next + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+
+    def dump(self) -> list[dict[str, int]]:
+        """return recorded frames, oldest first, with their age in milliseconds."""
+        now_ms = (time.monotonic_ns() // 1_000_000) & 0xFFFFFFFF
+        frames = []
+        for index in range(self._next - self._count, self._next):
+            values = self.record.unpack_from(
+                self._buffer, (index % self._size) * self.record.size
+            )
+            frames.append(
+                {
+                    "age_ms": (now_ms - values[0]) & 0xFFFFFFFF,
+                    **dict(zip(self.fields, values[1:])),
+                }
+            )
+        return frames
+
+
+# Optional capture of the raw frames reaching this quirk, for offline replay
+# with tools/candeo_replay.py. Frames are buffered and appended to CAPTURE_PATH
+# from a worker thread once CAPTURE_FLUSH_BYTES or CAPTURE_FLUSH_INTERVAL is hit,
+# and once more at exit.
+CAPTURE_PATH: Final[str | None] = None
+CAPTURE_FLUSH_BYTES: Final = 4096
+CAPTURE_FLUSH_INTERVAL: Final = 5.0
+
+
+class _CandeoFrameCapture:
+    """_CandeoFrameCapture: append-only binary capture of received ZCL frames."""
+
+    magic: Final = b"CANDEOCAP1\n"
+    # wall clock ns, ieee, endpoint id, cluster id, flags (bit 0: server cluster)
+    # and frame length, followed by the ZCL header and payload
+    record: Final = struct.Struct("<Q8sBHBH")
+
+    def __init__(self, path: str):
+        """__init___"""
+        self.path = path
+        self._buffer = bytearray()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        atexit.register(self._write_pending)
+
+    def add(self, cluster: CustomCluster, hdr: foundation.ZCLHeader, args: Any) -> None:
+        """buffer a received frame."""
+        try:
+            frame = hdr.serialize() + args.serialize()
+        except (AttributeError, TypeError, ValueError):
+            _LOGGER.debug("CandeoCZBSR5BRSceneSwitchRemote: unable to capture frame %s %s", hdr, args)
+            return
+        self._buffer += self.record.pack(
+            time.time_ns(),
+            cluster.endpoint.device.ieee.serialize(),
+            cluster.endpoint.endpoint_id,
+            cluster.cluster_id,
+            int(cluster.is_server),
+            len(frame),
+        )
+        self._buffer += frame
+        if len(self._buffer) >= CAPTURE_FLUSH_BYTES:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(CAPTURE_FLUSH_INTERVAL, self.flush)
+
+    def flush(self) -> None:
+        """hand buffered frames to the writer thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(data)
+            return
+        if self._executor is None:
+            # imported here so installations without a capture never load the
+            # thread pool machinery; a single worker keeps the writes in order
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="candeo_capture")
+        loop.run_in_executor(self._executor, self._write, data)
+
+    def _write_pending(self) -> None:
+        """write frames still waiting for the flush timer, used at exit."""
+        if self._buffer:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._write(data)
+
+    def _write(self, data: bytes) -> None:
+        """append frames to the capture file."""
+        try:
+            with open(self.path, "ab") as capture:
+                if capture.tell() == 0:
+                    capture.write(self.magic)
+                capture.write(data)
+        except OSError as err:
+            _LOGGER.warning("CandeoCZBSR5BRSceneSwitchRemote: failed to write capture %s: %s", self.path, err)
+
+
+_FRAME_CAPTURE: Final = _CandeoFrameCapture(CAPTURE_PATH) if CAPTURE_PATH else None
+
+
+# The ring rotation state (last direction and rotation event) lives only in
+# memory, so after a restart rotations are ignored until the next stop frame.
+# When STATE_PATH is set it is kept in a JSON snapshot there and restored as
+# the clusters are constructed. Changes are written behind, at most once per
+# STATE_FLUSH_INTERVAL seconds and once more at exit. The file is read when
+# the quirk is imported and encoded and written on a worker thread, never on
+# the event loop. Snapshots of the wrong shape are logged and ignored. Use a
+# separate file for each quirk module.
+STATE_PATH: Final[str | None] = None
+STATE_FLUSH_INTERVAL: Final = 30.0
+
+
+class _CandeoStateStore:
+    """_CandeoStateStore: per device state snapshots with write-behind batching."""
+
+    def __init__(self, path: str):
+        """__init___"""
+        self.path = path
+        # read when the quirk is imported, which zhaquirks does off the event
+        # loop and before any device is built
+        self._states: dict[str, Any] = self._read()
+        self._dirty = False
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        atexit.register(self._write_pending)
+
+    def _read(self) -> dict[str, Any]:
+        """return the snapshot file contents, empty if missing or unreadable."""
+        try:
+            with open(self.path, encoding="utf-8") as snapshot:
+                states = json.load(snapshot)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            _LOGGER.warning("CandeoCZBSR5BRSceneSwitchRemote: failed to read state %s: %s", self.path, err)
+            return {}
+        if not isinstance(states, dict):
+            _LOGGER.warning("CandeoCZBSR5BRSceneSwitchRemote: ignoring malformed state %s", self.path)
+            return {}
+        return states
+
+    def get(self, key: str) -> Any:
+        """return the snapshot stored for key, None if there is none."""
+        return self._states.get(key)
+
+    def set(self, key: str, state: Any) -> None:
+        """store a JSON compatible snapshot for key and schedule a write."""
+        if self._states.get(key) == state:
+            return
+        self._states[key] = state
+        self._dirty = True
+        if self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(STATE_FLUSH_INTERVAL, self.flush)
+
+    def flush(self) -> None:
+        """hand a copy of the changed snapshots to the writer thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        # snapshots are replaced, never changed in place, so a shallow copy is
+        # enough; encoding it is left to the writer thread
+        states = dict(self._states)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(states)
+            return
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="candeo_state")
+        loop.run_in_executor(self._executor, self._write, states)
+
+    def _write_pending(self) -> None:
+        """write changes still waiting for the flush timer, used at exit."""
+        if self._dirty:
+            self._dirty = False
+            self._write(self._states)
+
+    def _write(self, states: dict[str, Any]) -> None:
+        """encode the snapshots and replace the snapshot file."""
+        temporary = self.path + ".tmp"
+        try:
+            data = json.dumps(states, separators=(",", ":"), sort_keys=True)
+            with open(temporary, "w", encoding="utf-8") as snapshot:
+                snapshot.write(data)
+            os.replace(temporary, self.path)
+        except OSError as err:
+            _LOGGER.warning("CandeoCZBSR5BRSceneSwitchRemote: failed to write state %s: %s", self.path, err)
+
+
+_STATE_STORE: Final = _CandeoStateStore(STATE_PATH) if STATE_PATH else None
+
+
+# Optional dispatch stage between the cluster and its listeners: decoded events
+# are queued and delivered by one shared task so frame handling returns at once.
+EVENT_DISPATCH_ENABLED: Final = False
+EVENT_DISPATCH_QUEUE_SIZE: Final = 256
+# Overflow policy when the queue is full: "drop_oldest" drops the oldest queued
+# droppable event, "merge_rotation" first folds a droppable event into an equal
+# newest entry, "deliver_oldest" never drops. When nothing may be dropped the
+# oldest event is delivered by the frame handler itself, so the queue stays
+# bounded. Only continued_ events are droppable here: losing a started_,
+# stopped_ or button event leaves automations stuck mid rotation.
+EVENT_DISPATCH_OVERFLOW: Final = "drop_oldest"
+
+
+class _CandeoEventDispatcher:
+    """_CandeoEventDispatcher: deliver queued events to cluster listeners from one shared task."""
+
+    def __init__(self, maxsize: int, overflow: str, droppable: tuple[str, ...]):
+        """__init___"""
+        if overflow not in ("drop_oldest", "merge_rotation", "deliver_oldest"):
+            raise ValueError(f"Unsupported event dispatch overflow policy: {overflow}")
+        self.maxsize = maxsize
+        self.overflow = overflow
+        # prefixes of the events an overflow may drop or merge
+        self.droppable = droppable
+        self.dropped = 0
+        self.merged = 0
+        self.delivered_inline = 0
+        # entries: cluster, event, received timestamp, repeat count
+        self._queue: deque[list[Any]] = deque()
+        self._wakeup: asyncio.Event | None = None
+        self._idle: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def dispatch(self, cluster: CustomCluster, event: str) -> None:
+        """queue event for delivery, applying the overflow policy when full."""
+        received_ns = time.monotonic_ns()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            cluster.listener_event(ZHA_SEND_EVENT, event, [])
+            return
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        if len(self._queue) >= self.maxsize and not self._make_room(cluster, event):
+            return
+        self._queue.append([cluster, event, received_ns, 1])
+        self._idle.clear()
+        self._wakeup.set()
+
+    def _make_room(self, cluster: CustomCluster, event: str) -> bool:
+        """free a slot in the full queue, return False when event is merged or dropped instead."""
+        queue = self._queue
+        droppable = event.startswith(self.droppable)
+        if droppable and self.overflow == "merge_rotation":
+            newest = queue[-1]
+            if newest[0] is cluster and newest[1] == event:
+                newest[3] += 1
+                self.merged += 1
+                return False
+        if self.overflow != "deliver_oldest":
+            for index, entry in enumerate(queue):
+                if entry[1].startswith(self.droppable):
+                    del queue[index]
+                    self.dropped += entry[3]
+                    return True
+            if droppable:
+                self.dropped += 1
+                return False
+        self.delivered_inline += 1
+        self._deliver(*queue.popleft())
+        return True
+
+    def _deliver(
+        self, cluster: CustomCluster, event: str, received_ns: int, repeat: int
+    ) -> None:
+        """hand one queued entry to the cluster listeners."""
+        try:
+            for _ in range(repeat):
+                cluster.listener_event(
+                    ZHA_SEND_EVENT,
+                    event,
+                    {"received_ns": received_ns, "dispatched_ns": time.monotonic_ns()},
+                )
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception(
+                "CandeoCZBSR5BRSceneSwitchRemote: failed to dispatch event %s", event
+            )
+
+    async def join(self) -> None:
+        """wait until every queued event has been delivered."""
+        if self._idle is not None and self._queue:
+            await self._idle.wait()
+
+    async def _run(self) -> None:
+        """deliver queued events, yielding to the loop between events."""
+        while True:
+            if not self._queue:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._deliver(*self._queue.popleft())
+            await asyncio.sleep(0)
+
+
+_EVENT_DISPATCHER: Final = (
+    _CandeoEventDispatcher(
+        EVENT_DISPATCH_QUEUE_SIZE, EVENT_DISPATCH_OVERFLOW, ("continued_",)
+    )
+    if EVENT_DISPATCH_ENABLED
+    else None
+)
+
+
+# Per-cluster runtime metrics, kept in fixed-size arrays so they are cheap
+# enough to leave enabled on every device. Handler latency buckets are powers of
+# two in microseconds (<1us, <2us, <4us ...), the last bucket is open ended.
+METRICS_LATENCY_BUCKETS: Final = 16
+_METRIC_COUNTERS: Final = ("frames_received", "duplicates_dropped", "unknown_commands", "default_responses_sent", "stops_synthesized", "late_stops_ignored")
+_FRAMES_RECEIVED, _DUPLICATES_DROPPED, _UNKNOWN_COMMANDS, _DEFAULT_RESPONSES_SENT, _STOPS_SYNTHESIZED, _LATE_STOPS_IGNORED = range(len(_METRIC_COUNTERS))
+
+
+class _CandeoClusterMetrics:
+    """_CandeoClusterMetrics: fixed-size counters, per-type counts and a handler latency histogram."""
+
+    __slots__ = ("counters", "by_type", "latency")
+
+    def __init__(self, types: int):
+        """__init___"""
+        self.counters = array("Q", bytes(8 * len(_METRIC_COUNTERS)))
+        # the extra slot counts types that are not in the fixed table
+        self.by_type = array("Q", bytes(8 * (types + 1)))
+        self.latency = array("Q", bytes(8 * METRICS_LATENCY_BUCKETS))
+
+    def observe_latency(self, elapsed_ns: int) -> None:
+        """add a handler duration to the latency histogram."""
+        bucket = (elapsed_ns // 1000).bit_length()
+        self.latency[bucket if bucket < METRICS_LATENCY_BUCKETS else -1] += 1
+
+    def as_dict(self, type_index: dict[Any, int]) -> dict[str, Any]:
+        """return a diagnostics friendly snapshot."""
+        by_type = {
+            key: self.by_type[index]
+            for key, index in type_index.items()
+            if self.by_type[index]
+        }
+        if self.by_type[-1]:
+            by_type["other"] = self.by_type[-1]
+        latency = {
+            f"<{1 << bucket}": count
+            for bucket, count in enumerate(self.latency[:-1])
+            if count
+        }
+        if self.latency[-1]:
+            latency[f">={1 << (METRICS_LATENCY_BUCKETS - 2)}"] = self.latency[-1]
+        return {
+            **dict(zip(_METRIC_COUNTERS, self.counters)),
+            "events": by_type,
+            "handler_latency_us": latency,
+        }
+
+
+# Opt-in profiling of the quirk handlers. With PROFILE_ENABLED the methods in
+# _PROFILED_METHODS and listener_event of this module's clusters are wrapped
+# when the module loads, so nothing is added when it is off. One call in
+# PROFILE_SAMPLE_RATE is timed per method (calls nested in a timed call are
+# always timed). A method's self time leaves out the time spent in the
+# profiled calls nested in it, listener_event (which runs the ZHA and other
+# listeners and is recorded on its own) included. Coroutine methods, and plain
+# ones returning an awaitable such as zigpy's bind, are timed until the await
+# completes; other tasks run meanwhile, so their self time is recorded as 0.
+# The results are logged every PROFILE_LOG_INTERVAL seconds and returned by
+# dump_profile().
+PROFILE_ENABLED: Final = False
+PROFILE_SAMPLE_RATE: Final = 1
+PROFILE_LOG_INTERVAL: Final = 300.0
+_PROFILED_METHODS: Final = (
+    "handle_message",
+    "handle_cluster_request",
+    "_update_attribute",
+    "bind",
+    "command",
+    "listener_event",
+)
+
+
+class _CandeoProfiler:
+    """_CandeoProfiler: sampled per method timing histograms."""
+
+    def __init__(self, sample_rate: int):
+        """__init___"""
+        self.sample_rate = max(sample_rate, 1)
+        # per method: sampled calls, total ns, self ns, then latency buckets
+        self.stats: dict[str, array] = {}
+        self._depth = 0
+        # time spent in the timed calls nested in the innermost open timed call
+        self._child_ns = 0
+        self._log_handle: asyncio.TimerHandle | None = None
+
+    def instrument(self, *clusters: type[CustomCluster]) -> None:
+        """wrap the profiled methods of the given cluster classes."""
+        for cluster in clusters:
+            for name in _PROFILED_METHODS:
+                stats = self.stats.setdefault(
+                    f"{cluster.__name__}.{name}",
+                    array("Q", bytes(8 * (3 + METRICS_LATENCY_BUCKETS))),
+                )
+                setattr(cluster, name, self._wrap(getattr(cluster, name), stats))
+
+    def _wrap(self, func: Callable, stats: array) -> Callable:
+        """return a timing wrapper around func."""
+        profiler = self
+        calls = 0
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                nonlocal calls
+                calls += 1
+                if calls % profiler.sample_rate:
+                    return await func(*args, **kwargs)
+                return await profiler.timed(func(*args, **kwargs), stats)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal calls
+            if not profiler._depth:
+                calls += 1
+                if calls % profiler.sample_rate:
+                    return func(*args, **kwargs)
+            child_ns = profiler._child_ns
+            profiler._child_ns = 0
+            profiler._depth += 1
+            result = None
+            start = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                profiler._depth -= 1
+                awaitable = inspect.isawaitable(result)
+                if not awaitable:
+                    profiler.record(stats, elapsed, elapsed - profiler._child_ns)
+                # the caller's self time leaves out this whole call
+                profiler._child_ns = child_ns + elapsed if profiler._depth else 0
+            if awaitable:
+                # a plain def handing back a coroutine (zigpy's bind), timed to
+                # its completion
+                return profiler.timed(result, stats, start)
+            return result
+
+        return wrapper
+
+    async def timed(self, awaitable: Any, stats: array, start: int = 0) -> Any:
+        """await and record a call, from start (default now) to its completion."""
+        start = start or time.perf_counter_ns()
+        try:
+            return await awaitable
+        finally:
+            # other tasks run while this awaits, so there is no self time
+            self.record(stats, time.perf_counter_ns() - start, 0)
+
+    def record(self, stats: array, elapsed_ns: int, self_ns: int) -> None:
+        """add one timed call."""
+        stats[0] += 1
+        stats[1] += elapsed_ns
+        stats[2] += self_ns
+        bucket = (elapsed_ns // 1000).bit_length()
+        stats[3 + min(bucket, METRICS_LATENCY_BUCKETS - 1)] += 1
+        if self._log_handle is None and PROFILE_LOG_INTERVAL:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._log_handle = loop.call_later(PROFILE_LOG_INTERVAL, self._log)
+
+    def _log(self) -> None:
+        """log the profile, re-armed by the next timed call."""
+        self._log_handle = None
+        _LOGGER.info("CandeoCZBSR5BRSceneSwitchRemote: handler profile %s", self.dump())
+
+    def dump(self, reset: bool = False) -> dict[str, Any]:
+        """return the timings of every method called so far."""
+        result = {}
+        for name, stats in self.stats.items():
+            calls = stats[0]
+            if not calls:
+                continue
+            result[name] = {
+                "sampled_calls": calls,
+                "mean_us": round(stats[1] / calls / 1000, 3),
+                "self_mean_us": round(stats[2] / calls / 1000, 3),
+                "total_ms": round(stats[1] / 1e6, 3),
+                "latency_us": {
+                    (
+                        f"<{1 << bucket}"
+                        if bucket < METRICS_LATENCY_BUCKETS - 1
+                        else f">={1 << (bucket - 1)}"
+                    ): count
+                    for bucket, count in enumerate(stats[3:])
+                    if count
+                },
+            }
+            if reset:
+                stats[:] = array("Q", bytes(8 * len(stats)))
+        return result
+
+
+_PROFILER: Final = _CandeoProfiler(PROFILE_SAMPLE_RATE) if PROFILE_ENABLED else None
+
+
+def dump_profile(reset: bool = False) -> dict[str, Any]:
+    """return the handler profile of this module, empty unless PROFILE_ENABLED."""
+    return _PROFILER.dump(reset) if _PROFILER is not None else {}
+
+
+# A ring rotation normally ends with a stop frame, which can arrive late or be
+# lost on a busy mesh and leave automations stuck on continued_ events. After
+# RING_IDLE_TIMEOUT seconds without a rotation frame the stop event is fired by
+# the quirk instead, and a stop frame arriving afterwards is ignored. Idle
+# deadlines of every remote share one timer wheel, so they cost no tasks and at
+# most one loop timer. None disables the synthesized stop.
+RING_IDLE_TIMEOUT: Final[float | None] = 1.0
+RING_IDLE_TICK: Final = 0.05
+
+
+class _CandeoTimerWheel:
+    """_CandeoTimerWheel: one loop timer expiring many short deadlines."""
+
+    def __init__(self, tick: float, horizon: float):
+        """__init___"""
+        self.tick = tick
+        # deadlines are measured on this clock, in seconds; offline replay sets
+        # it to the capture timestamps and, being manual, calls advance() itself
+        # instead of running the loop timer
+        self.clock: Callable[[], float] = time.monotonic
+        self.manual = False
+        self._size = int(horizon / tick) + 2
+        self._slots: list[set[_CandeoRingIdle]] = [set() for _ in range(self._size)]
+        # number of the last tick expired, slots are indexed by tick number
+        self._tick = 0
+        self._pending = 0
+        self._handle: asyncio.TimerHandle | None = None
+
+    def schedule(self, entry: _CandeoRingIdle, delay: float) -> None:
+        """(re)schedule entry.expire() in delay seconds, at most the horizon."""
+        now = self.clock()
+        if not self._pending:
+            self._tick = int(now / self.tick)
+        # the first tick that ends after the deadline, so an entry never expires early
+        deadline = int((now + delay) / self.tick) + 1
+        if deadline - self._tick >= self._size:
+            # the loop timer is running late, keep within the wheel
+            deadline = self._tick + self._size - 1
+        slot = deadline % self._size
+        if entry.slot == slot:
+            # frames arriving within one tick of each other keep their slot
+            return
+        self.cancel(entry)
+        if self._handle is None and not self.manual:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._handle = loop.call_later(self.tick, self._on_tick)
+        entry.slot = slot
+        self._slots[slot].add(entry)
+        self._pending += 1
+
+    def cancel(self, entry: _CandeoRingIdle) -> None:
+        """drop a scheduled entry."""
+        if entry.slot >= 0:
+            self._slots[entry.slot].discard(entry)
+            entry.slot = -1
+            self._pending -= 1
+
+    def advance(self, now: float) -> None:
+        """expire every entry whose deadline has passed at clock time now."""
+        self._expire_until(int(now / self.tick))
+
+    def drain(self) -> None:
+        """expire every pending entry, in deadline order."""
+        self._expire_until(self._tick + self._size)
+
+    def _expire_until(self, target: int) -> None:
+        """expire the slots of the ticks up to and including target."""
+        while self._pending and self._tick < target:
+            self._tick += 1
+            index = self._tick % self._size
+            due = self._slots[index]
+            if not due:
+                continue
+            self._slots[index] = set()
+            self._pending -= len(due)
+            for entry in due:
+                entry.slot = -1
+                try:
+                    entry.expire()
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception("CandeoCZBSR5BRSceneSwitchRemote: ring idle expiry failed")
+        self._tick = max(self._tick, target)
+
+    def _on_tick(self) -> None:
+        """loop timer: expire what is due and re-arm while anything is pending."""
+        self.advance(self.clock())
+        if self._pending and not self.manual:
+            self._handle = asyncio.get_running_loop().call_later(self.tick, self._on_tick)
+        else:
+            self._handle = None
+
+
+class _CandeoRingIdle:
+    """_CandeoRingIdle: idle deadline of one remote's ring rotation."""
+
+    __slots__ = ("cluster", "slot", "stop_synthesized")
+
+    def __init__(self, cluster: CustomCluster):
+        """__init___"""
+        self.cluster = cluster
+        self.slot = -1
+        self.stop_synthesized = False
+
+    def expire(self) -> None:
+        """no rotation frame within the idle timeout, fire the stop event."""
+        self.cluster.ring_idle()
+
+
+_RING_IDLE_WHEEL: Final = _CandeoTimerWheel(RING_IDLE_TICK, RING_IDLE_TIMEOUT) if RING_IDLE_TIMEOUT else None
+
+
 class CandeoCZBSR5BRSceneSwitchRemote(CustomDevice):
     """Candeo C-ZB-SR5BR Scene Switch Remote - 5 Button Rotary."""
 
@@ -106,7 +822,68 @@ class CandeoCZBSR5BRSceneSwitchRemote(CustomDevice):
             self.last_tsn = -1
             self.previous_direction = "unknown"
             self.previous_rotation_event = "unknown"
+            self._ring_idle = _CandeoRingIdle(self)
+            self._metrics = _CandeoClusterMetrics(len(_METRIC_EVENTS))
             super().__init__(*args, **kwargs)
+            self._debug_enabled = _debug_enabled(self)
+            self._trace = _CandeoFrameTrace(TRACE_FRAMES) if self._debug_enabled else None
+            self._state_key = str(self.endpoint.device.ieee)
+            if _STATE_STORE is not None:
+                self.restore_state(_STATE_STORE.get(self._state_key))
+
+        def restore_state(self, state: list[str] | None) -> None:
+            """resume the ring rotation state from a snapshot."""
+            if not state:
+                return
+            if not (
+                isinstance(state, list)
+                and len(state) == 2
+                and (state[0] == "unknown" or state[0] in self.ring_directions.values())
+                and (state[1] == "unknown" or state[1] in self.ring_actions.values())
+            ):
+                _LOGGER.warning(
+                    "CandeoCZBSR5BRSceneSwitchRemote: ignoring malformed state for %s: %r",
+                    self._state_key,
+                    state,
+                )
+                return
+            self.previous_direction, self.previous_rotation_event = state
+            if self.previous_rotation_event in ("started_", "continued_"):
+                # the rotation has long ended by the time the snapshot is read back
+                self.previous_rotation_event = "stopped_"
+
+        def save_state(self) -> None:
+            """snapshot the ring rotation state when persistence is enabled."""
+            if _STATE_STORE is not None:
+                _STATE_STORE.set(self._state_key, [self.previous_direction, self.previous_rotation_event])
+
+        def dump_trace(self) -> list[dict[str, int]]:
+            """return the most recent decoded frames of a debugged device."""
+            return self._trace.dump() if self._trace is not None else []
+
+        def diagnostics(self) -> dict[str, Any]:
+            """return runtime metrics for diagnostics."""
+            return self._metrics.as_dict(_METRIC_EVENTS)
+
+        def send_event(self, event: str) -> None:
+            """send event to listeners, through the dispatch queue when enabled."""
+            self._metrics.by_type[_METRIC_EVENTS.get(event, -1)] += 1
+            if _EVENT_DISPATCHER is not None:
+                _EVENT_DISPATCHER.dispatch(self, event)
+            else:
+                self.listener_event(ZHA_SEND_EVENT, event, [])
+
+        def ring_idle(self) -> None:
+            """fire the stop event of a rotation whose stop frame is overdue."""
+            if self.previous_rotation_event not in ("started_", "continued_") or self.previous_direction == "unknown":
+                return
+            if self._debug_enabled:
+                _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: ring idle, added event for stopped_[%s]", self.previous_direction)
+            self._metrics.counters[_STOPS_SYNTHESIZED] += 1
+            self._ring_idle.stop_synthesized = True
+            self.send_event("stopped_" + self.previous_direction)
+            self.previous_rotation_event = "stopped_"
+            self.save_state()
 
         def handle_message(
             self,
@@ -116,14 +893,21 @@ class CandeoCZBSR5BRSceneSwitchRemote(CustomDevice):
             dst_addressing: AddressingMode | None = None,
         ) -> None:
             """overwrite handle_message to suppress cluster_command events."""
-            self.debug(
-                "CandeoCZBSR5BRSceneSwitchRemote: Received command 0x%02X (TSN %d): %s",
-                hdr.command_id,
-                hdr.tsn,
-                args,
-            )
+            start = time.perf_counter_ns()
+            self._metrics.counters[_FRAMES_RECEIVED] += 1
+            if _FRAME_CAPTURE is not None:
+                _FRAME_CAPTURE.add(self, hdr, args)
+            if self._debug_enabled:
+                _trace_debug(
+                    self,
+                    "CandeoCZBSR5BRSceneSwitchRemote: Received command 0x%02X (TSN %d): %s",
+                    hdr.command_id,
+                    hdr.tsn,
+                    args,
+                )
             if hdr.frame_control.is_cluster:
                 self.handle_cluster_request(hdr, args, dst_addressing=dst_addressing)
+                self._metrics.observe_latency(time.perf_counter_ns() - start)
                 return
 
         def handle_cluster_request(
@@ -136,63 +920,94 @@ class CandeoCZBSR5BRSceneSwitchRemote(CustomDevice):
             ] = None,
         ):
             """overwrite handle_cluster_request to custom process this cluster."""
-            self.debug("CandeoCZBSR5BRSceneSwitchRemote: handle_cluster_request called")
+            if self._debug_enabled:
+                _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: handle_cluster_request called")
             if not hdr.frame_control.disable_default_response:
-                self.debug("CandeoCZBSR5BRSceneSwitchRemote: sending default response")
+                if self._debug_enabled:
+                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: sending default response")
+                self._metrics.counters[_DEFAULT_RESPONSES_SENT] += 1
                 self.send_default_rsp(hdr, status=foundation.Status.SUCCESS)
             if hdr.tsn == self.last_tsn:
-                self.debug("CandeoCZBSR5BRSceneSwitchRemote: ignoring duplicate frame from device")
+                if self._debug_enabled:
+                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: ignoring duplicate frame from device")
+                self._metrics.counters[_DUPLICATES_DROPPED] += 1
                 return
             self.last_tsn = hdr.tsn            
             if hdr.command_id == self.ServerCommandDefs.candeo_scene_switch_remote.id:
                 if args.field_1 is None or args.field_2 is None or args.field_3 is None or args.field_4 is None:
                     return
-                self.debug("CandeoCZBSR5BRSceneSwitchRemote: received field_1 - [%s] field_2 - [%s] field_3 - [%s] field_4 - [%s]", args.field_1, args.field_2, args.field_3, args.field_4)
+                if self._trace is not None:
+                    self._trace.add(hdr.tsn, hdr.command_id, args.field_1, args.field_2, args.field_3, args.field_4)
+                if self._debug_enabled:
+                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: received field_1 - [%s] field_2 - [%s] field_3 - [%s] field_4 - [%s]", args.field_1, args.field_2, args.field_3, args.field_4)
                 message_type = self.message_types.get(args.field_1, "unknown")
                 if message_type == "button_press":
                     button_number = self.button_numbers.get(args.field_3, "unknown")
                     button_action = self.button_actions.get(args.field_4, "unknown")
-                    self.debug("CandeoCZBSR5BRSceneSwitchRemote: button_number - [%s] button_action - [%s]", button_number, button_action)
+                    if self._debug_enabled:
+                        _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: button_number - [%s] button_action - [%s]", button_number, button_action)
                     if button_number != "unknown" and button_action != "unknown":
-                        self.listener_event(ZHA_SEND_EVENT, button_number + button_action, [])
+                        self.send_event(button_number + button_action)
                 elif message_type == "ring_rotation":
                     ring_action = self.ring_actions.get(args.field_3, "unknown")
-                    self.debug("CandeoCZBSR5BRSceneSwitchRemote: ring_action - [%s]", ring_action)
+                    if self._debug_enabled:
+                        _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: ring_action - [%s]", ring_action)
                     if ring_action != "unknown":
                         if ring_action == "stopped_":
-                            self.debug("CandeoCZBSR5BRSceneSwitchRemote: previous_direction - [%s]", self.previous_direction)
+                            if _RING_IDLE_WHEEL is not None:
+                                _RING_IDLE_WHEEL.cancel(self._ring_idle)
+                            if self._ring_idle.stop_synthesized:
+                                if self._debug_enabled:
+                                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: ignoring stop frame, stop event already sent after ring idle")
+                                self._metrics.counters[_LATE_STOPS_IGNORED] += 1
+                                self._ring_idle.stop_synthesized = False
+                                return
+                            if self._debug_enabled:
+                                _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: previous_direction - [%s]", self.previous_direction)
                             if self.previous_direction != "unknown":
-                                self.debug("CandeoCZBSR5BRSceneSwitchRemote: added event for stopped_[%s]", self.previous_direction)
-                                self.listener_event(ZHA_SEND_EVENT, "stopped_" + self.previous_direction, [])
+                                if self._debug_enabled:
+                                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: added event for stopped_[%s]", self.previous_direction)
+                                self.send_event("stopped_" + self.previous_direction)
                             self.previous_rotation_event = "stopped_"
                         else:
                             ring_direction = self.ring_directions.get(args.field_2, "unknown")
                             if ring_direction != "unknown":
-                                self.debug("CandeoCZBSR5BRSceneSwitchRemote: previous_rotation_event - [%s]", self.previous_rotation_event)
+                                if self._debug_enabled:
+                                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: previous_rotation_event - [%s]", self.previous_rotation_event)
                                 if self.previous_rotation_event != "unknown":
                                     ring_clicks = args.field_4
                                     if self.previous_rotation_event == "stopped_":
-                                        self.debug("CandeoCZBSR5BRSceneSwitchRemote: added initial event for ring_action - started_ ring_direction - [%s]", ring_direction)
-                                        self.listener_event(ZHA_SEND_EVENT, "started_" + ring_direction, [])
+                                        if self._debug_enabled:
+                                            _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: added initial event for ring_action - started_ ring_direction - [%s]", ring_direction)
+                                        self.send_event("started_" + ring_direction)
                                         self.previous_rotation_event = "started_"
                                         if ring_clicks > 1:
                                             for x in range(1, ring_clicks):
-                                                self.debug("CandeoCZBSR5BRSceneSwitchRemote: added [%s] extra event for ring_action - continued_ ring_direction - [%s]", x, ring_direction)
-                                                self.listener_event(ZHA_SEND_EVENT, "continued_" + ring_direction, [])
+                                                if self._debug_enabled:
+                                                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: added [%s] extra event for ring_action - continued_ ring_direction - [%s]", x, ring_direction)
+                                                self.send_event("continued_" + ring_direction)
                                             self.previous_rotation_event = "continued_"
                                     elif self.previous_rotation_event == "started_" or self.previous_rotation_event == "continued_":
-                                        self.debug("CandeoCZBSR5BRSceneSwitchRemote: added initial event for ring_action - continued_ ring_direction - [%s]", ring_direction)
-                                        self.listener_event(ZHA_SEND_EVENT, "continued_" + ring_direction, [])
+                                        if self._debug_enabled:
+                                            _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: added initial event for ring_action - continued_ ring_direction - [%s]", ring_direction)
+                                        self.send_event("continued_" + ring_direction)
                                         if ring_clicks > 1:
                                             for x in range(1, ring_clicks):
-                                                self.debug("CandeoCZBSR5BRSceneSwitchRemote: added [%s] extra event for ring_action - continued_ ring_direction - [%s]", x, ring_direction)
-                                                self.listener_event(ZHA_SEND_EVENT, "continued_" + ring_direction, [])
+                                                if self._debug_enabled:
+                                                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: added [%s] extra event for ring_action - continued_ ring_direction - [%s]", x, ring_direction)
+                                                self.send_event("continued_" + ring_direction)
                                         self.previous_rotation_event = "continued_"
+                                    self._ring_idle.stop_synthesized = False
+                                    if _RING_IDLE_WHEEL is not None:
+                                        _RING_IDLE_WHEEL.schedule(self._ring_idle, RING_IDLE_TIMEOUT)
                                 self.previous_direction = ring_direction
+                    self.save_state()
                 return
             else:
                 unknown_command = hdr.command_id
-                self.debug("CandeoCZBSR5BRSceneSwitchRemote: received unknown - [%s]", unknown_command)
+                self._metrics.counters[_UNKNOWN_COMMANDS] += 1
+                if self._debug_enabled:
+                    _trace_debug(self, "CandeoCZBSR5BRSceneSwitchRemote: received unknown - [%s]", unknown_command)
 
     signature = {
         MODELS_INFO: [("Candeo", "C-ZB-SR5BR")],
@@ -266,3 +1081,14 @@ class CandeoCZBSR5BRSceneSwitchRemote(CustomDevice):
         ("Continued Rotating Right", "Rotary Ring"): {ENDPOINT_ID: 1, COMMAND: "continued_rotating_right"},
         ("Stopped Rotating Right", "Rotary Ring"): {ENDPOINT_ID: 1, COMMAND: "stopped_rotating_right"},
     }
+
+
+_METRIC_EVENTS: Final = {
+    trigger[COMMAND]: index
+    for index, trigger in enumerate(
+        CandeoCZBSR5BRSceneSwitchRemote.device_automation_triggers.values()
+    )
+}
+
+if _PROFILER is not None:
+    _PROFILER.instrument(CandeoCZBSR5BRSceneSwitchRemote.CandeoCZBSR5BRSceneSwitchRemoteCluster)
@@ -2,7 +2,18 @@
 
 from __future__ import annotations
 
-from typing import Final, Optional, Union
+from array import array
+import asyncio
+import atexit
+from collections.abc import Callable
+import functools
+import inspect
+import json
+import logging
+import os
+import struct
+import time
+from typing import TYPE_CHECKING, Any, Final, Optional, Union
 
 import zigpy.types as t
 from zhaquirks.const import (
@@ -13,7 +24,7 @@ from zhaquirks.const import (
     OUTPUT_CLUSTERS,
     PROFILE_ID,
 )
-from zhaquirks.tuya import TUYA_MCU_COMMAND, TuyaLocalCluster
+from zhaquirks.tuya import TUYA_MCU_COMMAND, TuyaCommand, TuyaLocalCluster
 from zhaquirks.tuya.mcu import DPToAttributeMapping, TuyaClusterData, TuyaMCUCluster
 from zigpy.profiles import zha
 from zigpy.quirks import CustomCluster, CustomDevice
@@ -34,6 +45,642 @@ from zigpy.zcl.foundation import (
     ZCLCommandDef,
 )
 
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+
+_LOGGER = logging.getLogger(__name__)
+
+# Hot path debug logging is skipped entirely unless the device IEEE is listed
+# here ("*" enables every device). Listed devices log through this module's
+# logger, so one device can be debugged without enabling zigpy debug logging,
+# and keep the last TRACE_FRAMES decoded frames for dump_trace().
+DEBUG_DEVICES: Final[frozenset[str]] = frozenset()
+TRACE_FRAMES: Final = 32
+
+
+def _debug_enabled(cluster: CustomCluster) -> bool:
+    """return True when hot path debug logging is enabled for the cluster's device."""
+    return "*" in DEBUG_DEVICES or str(cluster.endpoint.device.ieee) in DEBUG_DEVICES
+
+
+def _trace_debug(cluster: CustomCluster, msg: str, *args: Any) -> None:
+    """log hot path debug message for a traced device."""
+    _LOGGER.debug(
+        "[%s:%s:0x%04x] " + msg,
+        cluster.endpoint.device.ieee,
+        cluster.endpoint.endpoint_id,
+        cluster.cluster_id,
+        *args,
+    )
+
+
+class _CandeoFrameTrace:
+    """_CandeoFrameTrace: preallocated ring buffer of the most recent decoded frames."""
+
+    __slots__ = ("_buffer", "_size", "_next", "_count")
+
+    # age timestamp, tuya tsn, data point id, data point type and value
+    record: Final = struct.Struct("<IHBBi")
+    fields: Final = ("tsn", "dp", "dp_type", "value")
+
+    def __init__(self, size: int):
+        """__init___"""
+        self._buffer = bytearray(self.record.size * size)
+        self._size = size
+        self._next = 0
+        self._count = 0
+
+    def add(self, *values: int) -> None:
+        """record a decoded frame, overwriting the oldest one when full."""
+        self.record.pack_into(
+            self._buffer,
+            self._next * self.record.size,
+            (time.monotonic_ns() // 1_000_000) & 0xFFFFFFFF,
+            *values,
+        )
+        self._next = (self._next + 1) % self._size
+        if self._count < self._size:
+            self._count += 1
+
+    def dump(self) -> list[dict[str, int]]:
+        """return recorded frames, oldest first, with their age in milliseconds."""
+        now_ms = (time.monotonic_ns() // 1_000_000) & 0xFFFFFFFF
+        frames = []
+        for index in range(self._next - self._count, self._next):
+            values = self.record.unpack_from(
+                self._buffer, (index % self._size) * self.record.size
+            )
+            frames.append(
+                {
+                    "age_ms": (now_ms - values[0]) & 0xFFFFFFFF,
+                    **dict(zip(self.fields, values[1:])),
+                }
+            )
+        return frames
+
+
+# Optional capture of the raw Tuya data point frames reaching this quirk, for offline replay
+# with tools/candeo_replay.py. Frames are buffered and appended to CAPTURE_PATH
+# from a worker thread once CAPTURE_FLUSH_BYTES or CAPTURE_FLUSH_INTERVAL is hit,
+# and once more at exit.
+CAPTURE_PATH: Final[str | None] = None
+CAPTURE_FLUSH_BYTES: Final = 4096
+CAPTURE_FLUSH_INTERVAL: Final = 5.0
+
+
+class _CandeoFrameCapture:
+    """_CandeoFrameCapture: append-only binary capture of received ZCL frames."""
+
+    magic: Final = b"CANDEOCAP1\n"
+    # wall clock ns, ieee, endpoint id, cluster id, flags (bit 0: server cluster)
+    # and frame length, followed by the ZCL header and payload
+    record: Final = struct.Struct("<Q8sBHBH")
+
+    def __init__(self, path: str):
+        """__init___"""
+        self.path = path
+        self._buffer = bytearray()
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        atexit.register(self._write_pending)
+
+    def add(self, cluster: CustomCluster, hdr: foundation.ZCLHeader, args: Any) -> None:
+        """buffer a received frame."""
+        try:
+            frame = hdr.serialize() + args.serialize()
+        except (AttributeError, TypeError, ValueError):
+            _LOGGER.debug(
+                "CandeoSmartIrrigationTimer: unable to capture frame %s %s", hdr, args
+            )
+            return
+        self._buffer += self.record.pack(
+            time.time_ns(),
+            cluster.endpoint.device.ieee.serialize(),
+            cluster.endpoint.endpoint_id,
+            cluster.cluster_id,
+            int(cluster.is_server),
+            len(frame),
+        )
+        self._buffer += frame
+        if len(self._buffer) >= CAPTURE_FLUSH_BYTES:
+            self.flush()
+        elif self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(CAPTURE_FLUSH_INTERVAL, self.flush)
+
+    def flush(self) -> None:
+        """hand buffered frames to the writer thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(data)
+            return
+        if self._executor is None:
+            # imported here so installations without a capture never load the
+            # thread pool machinery; a single worker keeps the writes in order
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="candeo_capture")
+        loop.run_in_executor(self._executor, self._write, data)
+
+    def _write_pending(self) -> None:
+        """write frames still waiting for the flush timer, used at exit."""
+        if self._buffer:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._write(data)
+
+    def _write(self, data: bytes) -> None:
+        """append frames to the capture file."""
+        try:
+            with open(self.path, "ab") as capture:
+                if capture.tell() == 0:
+                    capture.write(self.magic)
+                capture.write(data)
+        except OSError as err:
+            _LOGGER.warning(
+                "CandeoSmartIrrigationTimer: failed to write capture %s: %s",
+                self.path,
+                err,
+            )
+
+
+_FRAME_CAPTURE: Final = _CandeoFrameCapture(CAPTURE_PATH) if CAPTURE_PATH else None
+
+
+# Valve and timer state are attributes, which zigpy already keeps in its
+# attribute cache, but the battery history behind battery_time_to_empty lives
+# only in memory and would start over on every restart. When STATE_PATH is set
+# it is kept in a JSON snapshot there and restored as the clusters are
+# constructed. Changes are written behind, at most once per
+# STATE_FLUSH_INTERVAL seconds and once more at exit. The file is read when
+# the quirk is imported and encoded and written on a worker thread, never on
+# the event loop. Snapshots of the wrong shape are logged and ignored. Use a
+# separate file for each quirk module.
+STATE_PATH: Final[str | None] = None
+STATE_FLUSH_INTERVAL: Final = 30.0
+
+
+class _CandeoStateStore:
+    """_CandeoStateStore: per device state snapshots with write-behind batching."""
+
+    def __init__(self, path: str):
+        """__init___"""
+        self.path = path
+        # read when the quirk is imported, which zhaquirks does off the event
+        # loop and before any device is built
+        self._states: dict[str, Any] = self._read()
+        self._dirty = False
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        atexit.register(self._write_pending)
+
+    def _read(self) -> dict[str, Any]:
+        """return the snapshot file contents, empty if missing or unreadable."""
+        try:
+            with open(self.path, encoding="utf-8") as snapshot:
+                states = json.load(snapshot)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as err:
+            _LOGGER.warning(
+                "CandeoSmartIrrigationTimer: failed to read state %s: %s",
+                self.path,
+                err,
+            )
+            return {}
+        if not isinstance(states, dict):
+            _LOGGER.warning(
+                "CandeoSmartIrrigationTimer: ignoring malformed state %s", self.path
+            )
+            return {}
+        return states
+
+    def get(self, key: str) -> Any:
+        """return the snapshot stored for key, None if there is none."""
+        return self._states.get(key)
+
+    def set(self, key: str, state: Any) -> None:
+        """store a JSON compatible snapshot for key and schedule a write."""
+        if self._states.get(key) == state:
+            return
+        self._states[key] = state
+        self._dirty = True
+        if self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.flush()
+                return
+            self._flush_handle = loop.call_later(STATE_FLUSH_INTERVAL, self.flush)
+
+    def flush(self) -> None:
+        """hand a copy of the changed snapshots to the writer thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        self._dirty = False
+        # snapshots are replaced, never changed in place, so a shallow copy is
+        # enough; encoding it is left to the writer thread
+        states = dict(self._states)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(states)
+            return
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="candeo_state")
+        loop.run_in_executor(self._executor, self._write, states)
+
+    def _write_pending(self) -> None:
+        """write changes still waiting for the flush timer, used at exit."""
+        if self._dirty:
+            self._dirty = False
+            self._write(self._states)
+
+    def _write(self, states: dict[str, Any]) -> None:
+        """encode the snapshots and replace the snapshot file."""
+        temporary = self.path + ".tmp"
+        try:
+            data = json.dumps(states, separators=(",", ":"), sort_keys=True)
+            with open(temporary, "w", encoding="utf-8") as snapshot:
+                snapshot.write(data)
+            os.replace(temporary, self.path)
+        except OSError as err:
+            _LOGGER.warning(
+                "CandeoSmartIrrigationTimer: failed to write state %s: %s",
+                self.path,
+                err,
+            )
+
+
+_STATE_STORE: Final = _CandeoStateStore(STATE_PATH) if STATE_PATH else None
+
+
+# Per-cluster runtime metrics, kept in fixed-size arrays so they are cheap
+# enough to leave enabled on every device. Handler latency buckets are powers of
+# two in microseconds (<1us, <2us, <4us ...), the last bucket is open ended.
+METRICS_LATENCY_BUCKETS: Final = 16
+_METRIC_COUNTERS: Final = (
+    "frames_received",
+    "unknown_commands",
+    "default_responses_sent",
+)
+(
+    _FRAMES_RECEIVED,
+    _UNKNOWN_COMMANDS,
+    _DEFAULT_RESPONSES_SENT,
+) = range(len(_METRIC_COUNTERS))
+
+
+class _CandeoClusterMetrics:
+    """_CandeoClusterMetrics: fixed-size counters, per-type counts and a handler latency histogram."""
+
+    __slots__ = ("counters", "by_type", "latency")
+
+    def __init__(self, types: int):
+        """__init___"""
+        self.counters = array("Q", bytes(8 * len(_METRIC_COUNTERS)))
+        # the extra slot counts types that are not in the fixed table
+        self.by_type = array("Q", bytes(8 * (types + 1)))
+        self.latency = array("Q", bytes(8 * METRICS_LATENCY_BUCKETS))
+
+    def observe_latency(self, elapsed_ns: int) -> None:
+        """add a handler duration to the latency histogram."""
+        bucket = (elapsed_ns // 1000).bit_length()
+        self.latency[bucket if bucket < METRICS_LATENCY_BUCKETS else -1] += 1
+
+    def as_dict(self, type_index: dict[Any, int]) -> dict[str, Any]:
+        """return a diagnostics friendly snapshot."""
+        by_type = {
+            key: self.by_type[index]
+            for key, index in type_index.items()
+            if self.by_type[index]
+        }
+        if self.by_type[-1]:
+            by_type["other"] = self.by_type[-1]
+        latency = {
+            f"<{1 << bucket}": count
+            for bucket, count in enumerate(self.latency[:-1])
+            if count
+        }
+        if self.latency[-1]:
+            latency[f">={1 << (METRICS_LATENCY_BUCKETS - 2)}"] = self.latency[-1]
+        return {
+            **dict(zip(_METRIC_COUNTERS, self.counters)),
+            "dp_updates": by_type,
+            "handler_latency_us": latency,
+        }
+
+
+# Opt-in profiling of the quirk handlers. With PROFILE_ENABLED the methods in
+# _PROFILED_METHODS and listener_event of this module's clusters are wrapped
+# when the module loads, so nothing is added when it is off. One call in
+# PROFILE_SAMPLE_RATE is timed per method (calls nested in a timed call are
+# always timed). A method's self time leaves out the time spent in the
+# profiled calls nested in it, listener_event (which runs the ZHA and other
+# listeners and is recorded on its own) included. Coroutine methods, and plain
+# ones returning an awaitable such as zigpy's bind, are timed until the await
+# completes; other tasks run meanwhile, so their self time is recorded as 0.
+# The results are logged every PROFILE_LOG_INTERVAL seconds and returned by
+# dump_profile().
+PROFILE_ENABLED: Final = False
+PROFILE_SAMPLE_RATE: Final = 1
+PROFILE_LOG_INTERVAL: Final = 300.0
+_PROFILED_METHODS: Final = (
+    "handle_message",
+    "handle_cluster_request",
+    "_update_attribute",
+    "bind",
+    "command",
+    "listener_event",
+)
+
+
+class _CandeoProfiler:
+    """_CandeoProfiler: sampled per method timing histograms."""
+
+    def __init__(self, sample_rate: int):
+        """__init___"""
+        self.sample_rate = max(sample_rate, 1)
+        # per method: sampled calls, total ns, self ns, then latency buckets
+        self.stats: dict[str, array] = {}
+        self._depth = 0
+        # time spent in the timed calls nested in the innermost open timed call
+        self._child_ns = 0
+        self._log_handle: asyncio.TimerHandle | None = None
+
+    def instrument(self, *clusters: type[CustomCluster]) -> None:
+        """wrap the profiled methods of the given cluster classes."""
+        for cluster in clusters:
+            for name in _PROFILED_METHODS:
+                stats = self.stats.setdefault(
+                    f"{cluster.__name__}.{name}",
+                    array("Q", bytes(8 * (3 + METRICS_LATENCY_BUCKETS))),
+                )
+                setattr(cluster, name, self._wrap(getattr(cluster, name), stats))
+
+    def _wrap(self, func: Callable, stats: array) -> Callable:
+        """return a timing wrapper around func."""
+        profiler = self
+        calls = 0
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                nonlocal calls
+                calls += 1
+                if calls % profiler.sample_rate:
+                    return await func(*args, **kwargs)
+                return await profiler.timed(func(*args, **kwargs), stats)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal calls
+            if not profiler._depth:
+                calls += 1
+                if calls % profiler.sample_rate:
+                    return func(*args, **kwargs)
+            child_ns = profiler._child_ns
+            profiler._child_ns = 0
+            profiler._depth += 1
+            result = None
+            start = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                profiler._depth -= 1
+                awaitable = inspect.isawaitable(result)
+                if not awaitable:
+                    profiler.record(stats, elapsed, elapsed - profiler._child_ns)
+                # the caller's self time leaves out this whole call
+                profiler._child_ns = child_ns + elapsed if profiler._depth else 0
+            if awaitable:
+                # a plain def handing back a coroutine (zigpy's bind), timed to
+                # its completion
+                return profiler.timed(result, stats, start)
+            return result
+
+        return wrapper
+
+    async def timed(self, awaitable: Any, stats: array, start: int = 0) -> Any:
+        """await and record a call, from start (default now) to its completion."""
+        start = start or time.perf_counter_ns()
+        try:
+            return await awaitable
+        finally:
+            # other tasks run while this awaits, so there is no self time
+            self.record(stats, time.perf_counter_ns() - start, 0)
+
+    def record(self, stats: array, elapsed_ns: int, self_ns: int) -> None:
+        """add one timed call."""
+        stats[0] += 1
+        stats[1] += elapsed_ns
+        stats[2] += self_ns
+        bucket = (elapsed_ns // 1000).bit_length()
+        stats[3 + min(bucket, METRICS_LATENCY_BUCKETS - 1)] += 1
+        if self._log_handle is None and PROFILE_LOG_INTERVAL:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._log_handle = loop.call_later(PROFILE_LOG_INTERVAL, self._log)
+
+    def _log(self) -> None:
+        """log the profile, re-armed by the next timed call."""
+        self._log_handle = None
+        _LOGGER.info("CandeoSmartIrrigationTimer: handler profile %s", self.dump())
+
+    def dump(self, reset: bool = False) -> dict[str, Any]:
+        """return the timings of every method called so far."""
+        result = {}
+        for name, stats in self.stats.items():
+            calls = stats[0]
+            if not calls:
+                continue
+            result[name] = {
+                "sampled_calls": calls,
+                "mean_us": round(stats[1] / calls / 1000, 3),
+                "self_mean_us": round(stats[2] / calls / 1000, 3),
+                "total_ms": round(stats[1] / 1e6, 3),
+                "latency_us": {
+                    (
+                        f"<{1 << bucket}"
+                        if bucket < METRICS_LATENCY_BUCKETS - 1
+                        else f">={1 << (bucket - 1)}"
+                    ): count
+                    for bucket, count in enumerate(stats[3:])
+                    if count
+                },
+            }
+            if reset:
+                stats[:] = array("Q", bytes(8 * len(stats)))
+        return result
+
+
+_PROFILER: Final = _CandeoProfiler(PROFILE_SAMPLE_RATE) if PROFILE_ENABLED else None
+
+
+def dump_profile(reset: bool = False) -> dict[str, Any]:
+    """return the handler profile of this module, empty unless PROFILE_ENABLED."""
+    return _PROFILER.dump(reset) if _PROFILER is not None else {}
+
+
+# Battery history for the time-to-empty estimate: the first reading of each
+# BATTERY_HISTORY_INTERVAL seconds is kept, in fixed arrays of
+# BATTERY_HISTORY_SIZE entries; later readings in the interval only update the
+# current level the estimate counts down from. The drain rate is a least squares
+# fit kept as running sums, so a reading costs a constant amount of work however
+# long the history is, and a repeated level costs no fit or estimate work at all.
+# A rise of at least BATTERY_REPLACED_RISE percent is taken as new batteries and
+# starts over. Without an estimate the attribute reads 0xFFFFFFFF (invalid).
+BATTERY_HISTORY_SIZE: Final = 64
+BATTERY_HISTORY_INTERVAL: Final = 6 * 3600
+BATTERY_TREND_MIN_SAMPLES: Final = 3
+BATTERY_REPLACED_RISE: Final = 10
+_BATTERY_INTERVAL_HOURS: Final = BATTERY_HISTORY_INTERVAL / 3600
+
+
+class _CandeoBatteryTrend:
+    """_CandeoBatteryTrend: downsampled battery readings and an incremental drain rate fit."""
+
+    __slots__ = (
+        "origin",
+        "hours",
+        "levels",
+        "head",
+        "count",
+        "interval_end",
+        "level",
+        "sx",
+        "sy",
+        "sxx",
+        "sxy",
+    )
+
+    def __init__(self, size: int):
+        """__init___"""
+        self.origin = 0.0
+        # hours since origin and battery percentage of each retained reading
+        self.hours = array("f", bytes(4 * size))
+        self.levels = array("f", bytes(4 * size))
+        self.head = 0
+        self.count = 0
+        # hours since origin at which the interval of the newest reading ends
+        self.interval_end = 0.0
+        # newest battery percentage, which may be newer than the retained readings
+        self.level = 0.0
+        # least squares sums over the retained readings, count is n
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+    def _account(self, x: float, y: float, sign: int) -> None:
+        """add (sign 1) or remove (sign -1) a point from the running sums."""
+        self.sx += sign * x
+        self.sy += sign * y
+        self.sxx += sign * x * x
+        self.sxy += sign * x * y
+
+    def add(self, timestamp: float, level: float) -> bool:
+        """record a battery percentage reading at a unix timestamp, False when it changes nothing."""
+        if self.count and level - self.level >= BATTERY_REPLACED_RISE:
+            self.count = 0
+            self.sx = self.sy = self.sxx = self.sxy = 0.0
+        if not self.count:
+            self.origin = timestamp
+        x = (timestamp - self.origin) / 3600
+        if self.count and x < self.interval_end:
+            # the first reading of an interval stands for it, later ones only move the level
+            if level == self.level:
+                return False
+            self.level = level
+            return True
+        self._append(x, level)
+        return True
+
+    def _append(self, x: float, level: float) -> None:
+        """store a reading that starts a new interval, dropping the oldest when full."""
+        size = len(self.hours)
+        if self.count == size:
+            # full, the oldest reading is the one about to be overwritten
+            self._account(self.hours[self.head], self.levels[self.head], -1)
+            self.count -= 1
+        self.hours[self.head] = x
+        self.levels[self.head] = level
+        self._account(self.hours[self.head], self.levels[self.head], 1)
+        self.head = (self.head + 1) % size
+        self.count += 1
+        self.interval_end = (x // _BATTERY_INTERVAL_HOURS + 1) * _BATTERY_INTERVAL_HOURS
+        self.level = level
+
+    def drain_rate(self) -> float | None:
+        """return the fitted drain in percent per hour, None without a usable fit."""
+        n = self.count
+        if n < BATTERY_TREND_MIN_SAMPLES:
+            return None
+        spread = n * self.sxx - self.sx * self.sx
+        if spread <= 1e-9:
+            return None
+        return -(n * self.sxy - self.sx * self.sy) / spread
+
+    def snapshot(self) -> list[Any]:
+        """return the retained readings, oldest first, for the state store."""
+        size = len(self.hours)
+        indexes = [(self.head - self.count + i) % size for i in range(self.count)]
+        return [
+            self.origin,
+            [round(self.hours[i], 4) for i in indexes],
+            [self.levels[i] for i in indexes],
+        ]
+
+    def restore(self, snapshot: Any) -> bool:
+        """resume from a snapshot() taken before a restart, False if it is malformed."""
+        if not (
+            isinstance(snapshot, list)
+            and len(snapshot) == 3
+            and isinstance(snapshot[1], list)
+            and isinstance(snapshot[2], list)
+            and len(snapshot[1]) == len(snapshot[2])
+            and all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in (snapshot[0], *snapshot[1], *snapshot[2])
+            )
+        ):
+            return False
+        origin, hours, levels = snapshot
+        size = len(self.hours)
+        self.origin = origin
+        self.count = self.head = 0
+        self.sx = self.sy = self.sxx = self.sxy = 0.0
+        for x, y in zip(hours[-size:], levels[-size:]):
+            self._append(x, y)
+        return True
+
+    def time_to_empty(self) -> int | None:
+        """return the estimated seconds until the battery is empty, None if not draining."""
+        rate = self.drain_rate()
+        if rate is None or rate <= 0:
+            return None
+        return min(int(self.level / rate * 3600), 0xFFFFFFFE)
+
 
 class _CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster(
     CustomCluster, PowerConfiguration
@@ -44,6 +691,27 @@ class _CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster(
     cluster_id: Final[t.uint16_t] = 0x0001
     name: Final = "Power Configuration"
     ep_attribute: Final = "power"
+    attributes = PowerConfiguration.attributes.copy()
+    attributes.update(
+        {
+            0xEF00: ("battery_time_to_empty", t.uint32_t, True),
+        }
+    )
+
+    def __init__(self, *args, **kwargs):
+        """__init___"""
+        self._battery_trend = _CandeoBatteryTrend(BATTERY_HISTORY_SIZE)
+        super().__init__(*args, **kwargs)
+        self._debug_enabled = _debug_enabled(self)
+        self._state_key = f"{self.endpoint.device.ieee}/battery"
+        if _STATE_STORE is not None:
+            snapshot = _STATE_STORE.get(self._state_key)
+            if snapshot and not self._battery_trend.restore(snapshot):
+                _LOGGER.warning(
+                    "CandeoSmartIrrigationTimer: ignoring malformed state for %s: %r",
+                    self._state_key,
+                    snapshot,
+                )
 
     async def bind(self):
         """Prevent bind."""
@@ -62,23 +730,44 @@ class _CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster(
 
     def _update_attribute(self, attrid, value):
         """overwrite _update_attribute"""
-        self.debug(
-            "_CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster: \
-            _update_attribute called - attrid: [%s] value: [%s]",
-            attrid,
-            value,
-        )
+        if self._debug_enabled:
+            _trace_debug(
+                self,
+                "_CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster: \
+                _update_attribute called - attrid: [%s] value: [%s]",
+                attrid,
+                value,
+            )
         if (
             attrid == 0x0021
             or attrid == "battery_percentage_remaining"
             or attrid == self.attributes.battery_percentage_remaining
         ):
-            self.debug(
-                "_CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster: \
-                updating battery percentage"
-            )
-            value = value * 2
-            super()._update_attribute(0x0021, value)
+            if self._debug_enabled:
+                _trace_debug(
+                    self,
+                    "_CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster: \
+                    updating battery percentage",
+                )
+            changed = self._battery_trend.add(time.time(), value)
+            if changed and _STATE_STORE is not None:
+                _STATE_STORE.set(self._state_key, self._battery_trend.snapshot())
+            super()._update_attribute(0x0021, value * 2)
+            if not changed and 0xEF00 in self._attr_cache:
+                return
+            time_to_empty = self._battery_trend.time_to_empty()
+            if time_to_empty is None:
+                # no estimate (yet), report the ZCL invalid value
+                time_to_empty = 0xFFFFFFFF
+            if time_to_empty != self._attr_cache.get(0xEF00):
+                if self._debug_enabled:
+                    _trace_debug(
+                        self,
+                        "_CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster: \
+                        estimated battery time to empty [%s] seconds",
+                        time_to_empty,
+                    )
+                super()._update_attribute(0xEF00, time_to_empty)
 
 
 class CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster(
@@ -109,6 +798,7 @@ class CandeoSmartIrrigationTimerOnOff(OnOff, TuyaLocalCluster):
     def __init__(self, *args, **kwargs):
         """__init___"""
         super().__init__(*args, **kwargs)
+        self._debug_enabled = _debug_enabled(self)
 
     async def bind(self):
         """overwrite bind"""
@@ -140,15 +830,19 @@ class CandeoSmartIrrigationTimerOnOff(OnOff, TuyaLocalCluster):
 
     def _update_attribute(self, attrid, value):
         """overwrite _update_attribute"""
-        self.debug(
-            "CandeoSmartIrrigationTimerOnOff: _update_attribute called - attrid: [%s] value: [%s]",
-            attrid,
-            value,
-        )
-        if attrid == 0:
-            self.debug(
-                "CandeoSmartIrrigationTimerOnOff: device turned on, setting automatic close timer"
+        if self._debug_enabled:
+            _trace_debug(
+                self,
+                "CandeoSmartIrrigationTimerOnOff: _update_attribute called - attrid: [%s] value: [%s]",
+                attrid,
+                value,
             )
+        if attrid == 0:
+            if self._debug_enabled:
+                _trace_debug(
+                    self,
+                    "CandeoSmartIrrigationTimerOnOff: device turned on, setting automatic close timer",
+                )
             cluster_data = TuyaClusterData(
                 endpoint_id=self.endpoint.endpoint_id,
                 cluster_name="CandeoSmartIrrigationTimer_Cluster",
@@ -284,13 +978,74 @@ class CandeoSmartIrrigationTimer(CustomDevice):
             15: "_dp_2_attr_update",
         }
 
+        def __init__(self, *args, **kwargs):
+            """__init___"""
+            self._metrics = _CandeoClusterMetrics(len(_METRIC_DPS))
+            super().__init__(*args, **kwargs)
+            self._debug_enabled = _debug_enabled(self)
+            self._trace = (
+                _CandeoFrameTrace(TRACE_FRAMES) if self._debug_enabled else None
+            )
+
+        def dump_trace(self) -> list[dict[str, int]]:
+            """return the most recent data point reports of a debugged device"""
+            return self._trace.dump() if self._trace is not None else []
+
+        def diagnostics(self) -> dict[str, Any]:
+            """return runtime metrics for diagnostics"""
+            return self._metrics.as_dict(_METRIC_DPS)
+
+        def handle_cluster_request(
+            self,
+            hdr: foundation.ZCLHeader,
+            args: tuple,
+            *,
+            dst_addressing: Optional[
+                Union[t.Addressing.Group, t.Addressing.IEEE, t.Addressing.NWK]
+            ] = None,
+        ) -> None:
+            """overwrite handle_cluster_request to collect metrics"""
+            start = time.perf_counter_ns()
+            self._metrics.counters[_FRAMES_RECEIVED] += 1
+            if _FRAME_CAPTURE is not None:
+                _FRAME_CAPTURE.add(self, hdr, args)
+            if hdr.direction == foundation.Direction.Server_to_Client:
+                commands = self.client_commands
+            else:
+                commands = self.server_commands
+            if hdr.command_id not in commands:
+                self._metrics.counters[_UNKNOWN_COMMANDS] += 1
+            if not hdr.frame_control.disable_default_response:
+                self._metrics.counters[_DEFAULT_RESPONSES_SENT] += 1
+            super().handle_cluster_request(hdr, args, dst_addressing=dst_addressing)
+            self._metrics.observe_latency(time.perf_counter_ns() - start)
+
+        def handle_get_data(self, command: TuyaCommand) -> foundation.Status:
+            """overwrite handle_get_data to count data point updates"""
+            for record in command.datapoints:
+                self._metrics.by_type[_METRIC_DPS.get(record.dp, -1)] += 1
+                if self._trace is not None:
+                    value = record.data.payload
+                    self._trace.add(
+                        command.tsn,
+                        record.dp,
+                        record.data.dp_type,
+                        value if isinstance(value, int) else 0,
+                    )
+            return super().handle_get_data(command)
+
+        handle_set_data_response = handle_get_data
+        handle_active_status_report = handle_get_data
+
         def _update_attribute(self, attrid, value):
             """overwrite _update_attribute"""
-            self.debug(
-                "CandeoSmartIrrigationTimer: _update_attribute called - attrid: [%s] value: [%s]",
-                attrid,
-                value,
-            )
+            if self._debug_enabled:
+                _trace_debug(
+                    self,
+                    "CandeoSmartIrrigationTimer: _update_attribute called - attrid: [%s] value: [%s]",
+                    attrid,
+                    value,
+                )
             super()._update_attribute(attrid, value)
 
     signature = {
@@ -326,3 +1081,18 @@ class CandeoSmartIrrigationTimer(CustomDevice):
             }
         }
     }
+
+
+_METRIC_DPS: Final = {
+    dp: index
+    for index, dp in enumerate(
+        CandeoSmartIrrigationTimer.CandeoSmartIrrigationTimerCluster.dp_to_attribute
+    )
+}
+
+if _PROFILER is not None:
+    _PROFILER.instrument(
+        CandeoSmartIrrigationTimerNoBindPowerConfigurationCluster,
+        CandeoSmartIrrigationTimerOnOff,
+        CandeoSmartIrrigationTimer.CandeoSmartIrrigationTimerCluster,
+    )
@@ -0,0 +1,367 @@
+"""Micro-benchmarks for the Candeo quirk hot paths, checked against a stored baseline.
+
+Usage:
+    python tools/candeo_benchmark.py              # compare against the baseline
+    python tools/candeo_benchmark.py --update     # record a new baseline
+    python tools/candeo_benchmark.py --threshold 10 -k rotary
+
+Each benchmark times one quirk method in isolation on a stub device. Absolute
+timings differ between machines and drift with CPU frequency and load, so
+every run is paired with a run of a fixed reference path (an attribute update
+on a stock zigpy OnOff cluster) timed right before it in the same process. A
+benchmark's cost is the median ratio of its time per call to the reference
+time per call over REPEATS pairs, after a warm-up, with the garbage collector
+paused; that ratio is what the baseline stores. The check fails (exit status
+1) when a cost is above its baseline by more than the threshold percentage.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Awaitable, Callable
+import gc
+import json
+import pathlib
+import statistics
+import sys
+import time
+from typing import Any
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    StubApplication,
+    VirtualClock,
+    create_device,
+    load_quirk,
+    zcl_frame,
+)
+import zigpy.device
+import zigpy.types as t
+from zhaquirks.tuya import TuyaCommand
+
+BASELINE = pathlib.Path(__file__).with_name("benchmark_baseline.json")
+# costs repeat within about +-15% from run to run, full or filtered with -k
+DEFAULT_THRESHOLD = 30.0
+REPEATS = 15
+TARGET_SECONDS = 0.02
+WARMUP_SECONDS = 0.1
+
+Benchmark = Callable[[int], None] | Callable[[int], Awaitable[None]]
+
+
+class _NullListener:
+    """Listener that accepts the events the quirks emit and drops them."""
+
+    def zha_send_event(self, *args: Any) -> None:
+        pass
+
+    def attribute_updated(self, *args: Any) -> None:
+        pass
+
+
+def _alternating(cluster: Any, *frames: bytes) -> list[tuple[Any, Any]]:
+    """Decode frames up front; callers alternate them so no tsn is a duplicate."""
+    return [cluster.deserialize(frame) for frame in frames]
+
+
+def _reference() -> Benchmark:
+    """Stock zigpy work the quirk paths are measured against."""
+    device = zigpy.device.Device(
+        StubApplication(), t.EUI64.convert("00:00:00:00:00:00:00:01"), 0x0001
+    )
+    cluster = device.add_endpoint(1).add_input_cluster(0x0006)
+    cluster.add_listener(_NullListener())
+
+    def run(loops: int) -> None:
+        for index in range(loops):
+            cluster._update_attribute(0x0000, bool(index & 1))
+
+    return run
+
+
+def _rotary() -> dict[str, Benchmark]:
+    module = load_quirk(QUIRK_DIR / QUIRK_FILES["rotary"])
+    device = create_device(
+        module.CandeoCZBSR5BRSceneSwitchRemote,
+        StubApplication(),
+        "00:00:00:00:00:00:01:01",
+    )
+    cluster = device.endpoints[1].in_clusters[0xFF03]
+    cluster.add_listener(_NullListener())
+
+    def handle(*frames: bytes) -> Benchmark:
+        decoded = _alternating(cluster, *frames)
+
+        def run(loops: int) -> None:
+            for index in range(loops):
+                hdr, args = decoded[index & 1]
+                cluster.previous_rotation_event = "continued_"
+                cluster.handle_cluster_request(hdr, args)
+
+        return run
+
+    def frame(tsn: int, *fields: int) -> bytes:
+        return zcl_frame(
+            tsn, 0x01, bytes(fields), manufacturer=0x1234, disable_default_response=True
+        )
+
+    benchmarks = {
+        "rotary.handle_cluster_request.button": handle(
+            frame(1, 0x01, 0x00, 0x01, 0x01), frame(2, 0x01, 0x00, 0x02, 0x02)
+        )
+    }
+    for clicks in (1, 5, 10, 20):
+        benchmarks[f"rotary.handle_cluster_request.ring_{clicks}_clicks"] = handle(
+            frame(1, 0x03, 0x01, 0x03, clicks), frame(2, 0x03, 0x02, 0x03, clicks)
+        )
+    return benchmarks
+
+
+def _modmote() -> dict[str, Benchmark]:
+    module = load_quirk(QUIRK_DIR / QUIRK_FILES["modmote"])
+    device = create_device(
+        module.CandeoModmote, StubApplication(), "00:00:00:00:00:00:02:01"
+    )
+    cluster = device.endpoints[2].out_clusters[0x0006]
+    cluster.add_listener(_NullListener())
+    server = device.endpoints[1].in_clusters[0x0006]
+    server.add_listener(_NullListener())
+    decoded = _alternating(
+        cluster,
+        zcl_frame(1, 0xFD, b"\x00", manufacturer=0x1002, disable_default_response=True),
+        zcl_frame(2, 0xFD, b"\x01", manufacturer=0x1002, disable_default_response=True),
+    )
+
+    def handle_press(loops: int) -> None:
+        for index in range(loops):
+            hdr, args = decoded[index & 1]
+            cluster.handle_cluster_request(hdr, args)
+
+    def gesture_press(loops: int) -> None:
+        # short and double presses on different buttons never complete a gesture
+        for index in range(loops):
+            device.gestures.press(2 + (index & 1), index & 1)
+
+    def update_switch_mode(loops: int) -> None:
+        for _ in range(loops):
+            server._update_attribute(0x8004, module.SwitchMode.Event)
+
+    return {
+        "modmote.handle_cluster_request.press": handle_press,
+        "modmote.handle_cluster_request.gestures": _modmote_gestures(),
+        "modmote.gestures.press": gesture_press,
+        "modmote._update_attribute.switch_mode": update_switch_mode,
+    }
+
+
+def _modmote_gestures() -> Benchmark:
+    """Presses that complete a gesture every two to four frames, on a virtual clock."""
+    module = load_quirk(QUIRK_DIR / QUIRK_FILES["modmote"], "candeo_modmote_gestures")
+    clock = VirtualClock(module)
+    device = create_device(
+        module.CandeoModmote, StubApplication(), "00:00:00:00:00:00:02:02"
+    )
+    # (seconds since the previous press, button, press type)
+    script = (
+        (1.0, 1, 0x00),  # closes the window of the sequence_1_2 below
+        (0.5, 2, 0x00),
+        (0.5, 3, 0x00),
+        (0.5, 4, 0x00),  # sequence_1_2_3_4
+        (1.0, 2, 0x01),
+        (0.3, 2, 0x00),  # triple press
+        (1.0, 3, 0x00),
+        (0.1, 4, 0x00),  # chord_3_4
+        (1.0, 1, 0x00),
+        (0.5, 2, 0x00),  # sequence_1_2, fired by the next press
+    )
+    for button in (1, 2, 3, 4):
+        device.endpoints[button].out_clusters[0x0006].add_listener(_NullListener())
+    presses = []
+    for tsn, (step, button, press_type) in enumerate(script, 1):
+        cluster = device.endpoints[button].out_clusters[0x0006]
+        hdr, args = cluster.deserialize(
+            zcl_frame(
+                tsn,
+                0xFD,
+                bytes((press_type,)),
+                manufacturer=0x1002,
+                disable_default_response=True,
+            )
+        )
+        presses.append((step, cluster, hdr, args))
+
+    def run(loops: int) -> None:
+        for index in range(loops):
+            step, cluster, hdr, args = presses[index % len(presses)]
+            clock.advance(clock.now + step)
+            cluster.handle_cluster_request(hdr, args)
+
+    return run
+
+
+def _irrigation() -> dict[str, Benchmark]:
+    module = load_quirk(QUIRK_DIR / QUIRK_FILES["irrigation"])
+    device = create_device(
+        module.CandeoSmartIrrigationTimer, StubApplication(), "00:00:00:00:00:00:03:01"
+    )
+    endpoint = device.endpoints[1]
+    for cluster in (endpoint.power, endpoint.on_off, endpoint.in_clusters[0xEF00]):
+        cluster.add_listener(_NullListener())
+    mcu = endpoint.in_clusters[0xEF00]
+    report, _ = TuyaCommand.deserialize(
+        bytes((0x00, 0x01))
+        + bytes((11, 0x02, 0x00, 0x04, 0x00, 0x00, 0x0E, 0x10))
+        + bytes((12, 0x04, 0x00, 0x01, 0x01))
+        + bytes((7, 0x02, 0x00, 0x04, 0x00, 0x00, 0x00, 0x28))
+    )
+
+    def dispatch_dps(loops: int) -> None:
+        for _ in range(loops):
+            mcu.handle_get_data(report)
+
+    def update_mcu_attribute(loops: int) -> None:
+        for index in range(loops):
+            mcu._update_attribute(0xEF01, index)
+
+    def update_battery(loops: int) -> None:
+        for index in range(loops):
+            endpoint.power._update_attribute(0x0021, index & 0x3F)
+
+    async def on_off_command(loops: int) -> None:
+        for index in range(loops):
+            await endpoint.on_off.command(index & 1)
+            if index & 0xFF == 0:
+                # let the MCU requests queued by the command drain
+                await asyncio.sleep(0)
+
+    return {
+        "irrigation.handle_get_data.dp_dispatch": dispatch_dps,
+        "irrigation._update_attribute.mcu": update_mcu_attribute,
+        "irrigation._update_attribute.battery": update_battery,
+        "irrigation.on_off.command": on_off_command,
+    }
+
+
+async def _time(benchmark: Benchmark, loops: int) -> float:
+    start = time.perf_counter()
+    result = benchmark(loops)
+    if asyncio.iscoroutine(result):
+        await result
+    elapsed = time.perf_counter() - start
+    # the quirks spawn tasks (default responses, MCU requests), let them finish
+    await asyncio.sleep(0)
+    return elapsed
+
+
+async def _calibrate(benchmark: Benchmark) -> int:
+    """Warm the path up and return the loop count that runs for TARGET_SECONDS."""
+    loops = 1
+    warmup_end = time.perf_counter() + WARMUP_SECONDS
+    while (elapsed := await _time(benchmark, loops)) < TARGET_SECONDS / 10:
+        loops *= 10
+    while time.perf_counter() < warmup_end:
+        elapsed = await _time(benchmark, loops)
+    return max(int(loops * TARGET_SECONDS / max(elapsed, 1e-9)), 1)
+
+
+async def measure(benchmark: Benchmark, reference: Benchmark) -> tuple[float, float]:
+    """Return the median cost relative to the reference and median ns per call."""
+    reference_loops = await _calibrate(reference)
+    loops = await _calibrate(benchmark)
+    ratios = []
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(REPEATS):
+            reference_ns = await _time(reference, reference_loops) / reference_loops
+            benchmark_ns = await _time(benchmark, loops) / loops
+            ratios.append(benchmark_ns / reference_ns)
+            times.append(benchmark_ns * 1e9)
+    finally:
+        gc.enable()
+    return statistics.median(ratios), statistics.median(times)
+
+
+async def run_benchmarks(selected: str | None) -> dict[str, tuple[float, float]]:
+    reference = _reference()
+    results = {}
+    for factory in (_rotary, _modmote, _irrigation):
+        for name, benchmark in factory().items():
+            if selected and selected not in name:
+                continue
+            cost, ns_per_call = await measure(benchmark, reference)
+            results[name] = (round(cost, 3), round(ns_per_call, 1))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--update", action="store_true", help="write the results as the new baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        help="allowed slowdown in percent "
+        f"(default: from the baseline, or {DEFAULT_THRESHOLD})",
+    )
+    parser.add_argument("--baseline", type=pathlib.Path, default=BASELINE)
+    parser.add_argument("-k", dest="selected", help="only run benchmarks matching this")
+    args = parser.parse_args()
+
+    baseline: dict[str, Any] = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    threshold = (
+        args.threshold
+        if args.threshold is not None
+        else baseline.get("threshold_percent", DEFAULT_THRESHOLD)
+    )
+
+    results = asyncio.run(run_benchmarks(args.selected))
+
+    if args.update:
+        merged = {
+            **baseline.get("relative_cost", {}),
+            **{name: cost for name, (cost, _) in results.items()},
+        }
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "threshold_percent": threshold,
+                    "relative_cost": dict(sorted(merged.items())),
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+        for name, (cost, ns_per_call) in results.items():
+            print(f"{name:<52}{cost:>9.3f}x{ns_per_call:>12.1f} ns")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    failed = False
+    recorded = baseline.get("relative_cost", {})
+    for name, (cost, ns_per_call) in results.items():
+        reference = recorded.get(name)
+        if reference is None:
+            print(f"{name:<52}{cost:>9.3f}x{ns_per_call:>12.1f} ns   (no baseline)")
+            continue
+        change = (cost - reference) / reference * 100
+        status = "ok"
+        if change > threshold:
+            status = "REGRESSION"
+            failed = True
+        print(
+            f"{name:<52}{cost:>9.3f}x{ns_per_call:>12.1f} ns {change:>+8.1f}%  {status}"
+        )
+    if failed:
+        print(f"one or more benchmarks regressed by more than {threshold}%")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""Stand-in zigpy application and endpoints for running Candeo quirks without a radio."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+import importlib.util
+import inspect
+import pathlib
+import re
+import struct
+import sys
+from types import ModuleType
+from typing import Any
+
+import zigpy.device
+from zigpy.quirks import CustomDevice
+import zigpy.types as t
+from zigpy.zcl import Cluster, foundation
+from zigpy.zcl.foundation import GENERAL_COMMANDS, GeneralCommand, Status
+
+# must match _CandeoFrameCapture in the quirk modules
+CAPTURE_MAGIC = b"CANDEOCAP1\n"
+CAPTURE_RECORD = struct.Struct("<Q8sBHBH")
+
+# module level timer wheels of the quirks, see VirtualClock
+TIMER_WHEELS = ("_RING_IDLE_WHEEL", "_GESTURE_WHEEL")
+
+QUIRK_DIR = pathlib.Path(__file__).resolve().parent.parent
+QUIRK_FILES = {
+    "rotary": "candeo_c-zb-sr5br_scene_switch_remote_5_button_rotary.py",
+    "modmote": "candeo_modmote.py",
+    "irrigation": "candeo_smart_irrigation_timer.py",
+}
+
+
+def load_quirk(
+    path: str | pathlib.Path,
+    name: str | None = None,
+    settings: dict[str, Any] | None = None,
+) -> ModuleType:
+    """Import a quirk file the same way zhaquirks loads custom quirks.
+
+    settings replaces the values of module level settings (one line UPPER_CASE
+    constants such as PROFILE_ENABLED) before the module runs, as editing the
+    file would.
+    """
+    path = pathlib.Path(path)
+    name = name or path.stem
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    if not settings:
+        spec.loader.exec_module(module)
+        return module
+    source = path.read_text(encoding="utf-8")
+    for setting, value in settings.items():
+        source, count = re.subn(
+            rf"^({setting}(?::[^=\n]*)?) = .*$",
+            lambda match: f"{match.group(1)} = {value!r}",
+            source,
+            count=1,
+            flags=re.MULTILINE,
+        )
+        if not count:
+            raise KeyError(f"{path.name} has no setting {setting}")
+    exec(compile(source, str(path), "exec"), module.__dict__)
+    return module
+
+
+def quirk_classes(module: ModuleType) -> list[type[CustomDevice]]:
+    """Return the quirk device classes defined by a quirk module."""
+    return [
+        cls
+        for _, cls in inspect.getmembers(module, inspect.isclass)
+        if issubclass(cls, CustomDevice)
+        and cls.__module__ == module.__name__
+        and cls.signature is not None
+    ]
+
+
+class VirtualClock:
+    """Run the quirk timer wheels on a clock the caller sets, not the event loop's.
+
+    Idle deadlines and gesture windows then follow the frame timestamps of a
+    capture or simulation, however fast the frames are fed in.
+    """
+
+    def __init__(self, module: ModuleType) -> None:
+        self.now = 0.0
+        self.wheels = [
+            wheel
+            for name in TIMER_WHEELS
+            if (wheel := getattr(module, name, None)) is not None
+        ]
+        for wheel in self.wheels:
+            wheel.clock = self.time
+            wheel.manual = True
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, now: float) -> None:
+        """Move the clock forward to now (seconds) and expire what is due."""
+        self.now = max(self.now, now)
+        for wheel in self.wheels:
+            wheel.advance(self.now)
+
+    def drain(self) -> None:
+        """Expire every pending deadline, as if the clock ran on until they passed."""
+        for wheel in self.wheels:
+            wheel.drain()
+
+
+class StubApplication:
+    """Minimal controller application: requests succeed without touching a radio."""
+
+    _dblistener = None
+
+    def __init__(self) -> None:
+        self.requests_sent = 0
+        self._devices: dict[t.EUI64, zigpy.device.Device] = {}
+
+    def get_dst_address(self, cluster: Cluster) -> None:
+        return None
+
+    async def request(
+        self,
+        device: zigpy.device.Device,
+        profile: int,
+        cluster: int,
+        src_ep: int,
+        dst_ep: int,
+        sequence: int,
+        data: bytes,
+        *,
+        expect_reply: bool = True,
+        **kwargs: Any,
+    ) -> tuple[Status, str]:
+        """Accept the request and answer it with a successful default response."""
+        self.requests_sent += 1
+        if expect_reply and sequence in device._pending:
+            hdr, _ = foundation.ZCLHeader.deserialize(data)
+            device._pending[sequence].result.set_result(
+                GENERAL_COMMANDS[GeneralCommand.Default_Response].schema(
+                    command_id=hdr.command_id, status=Status.SUCCESS
+                )
+            )
+        return Status.SUCCESS, ""
+
+
+class EventRecorder:
+    """Cluster listener that records what the quirks emit."""
+
+    def __init__(self, keep: bool = True) -> None:
+        self.keep = keep
+        self.count = 0
+        self.events: list[tuple[Any, ...]] = []
+
+    def attach(self, device: CustomDevice) -> None:
+        for cluster in iter_clusters(device):
+            cluster.add_listener(_ClusterRecorder(self, cluster))
+
+    def record(self, *event: Any) -> None:
+        self.count += 1
+        if self.keep:
+            self.events.append(event)
+
+
+class _ClusterRecorder:
+    """Forward listener callbacks of one cluster to an EventRecorder."""
+
+    def __init__(self, recorder: EventRecorder, cluster: Cluster) -> None:
+        self._recorder = recorder
+        self._key = (
+            str(cluster.endpoint.device.ieee),
+            cluster.endpoint.endpoint_id,
+            f"0x{cluster.cluster_id:04x}",
+        )
+
+    def zha_send_event(self, command: str, args: Any) -> None:
+        # the optional dispatch queue adds latency timestamps, which never replay equal
+        if isinstance(args, dict) and "received_ns" in args:
+            args = []
+        self._recorder.record(*self._key, "event", command, args)
+
+    def attribute_updated(self, attrid: int, value: Any, *args: Any) -> None:
+        self._recorder.record(*self._key, "attribute", attrid, value)
+
+
+def create_device(
+    quirk: type[CustomDevice],
+    app: StubApplication,
+    ieee: t.EUI64 | str,
+    nwk: int = 0x1234,
+) -> CustomDevice:
+    """Build the device described by a quirk signature and apply the quirk to it."""
+    if isinstance(ieee, str):
+        ieee = t.EUI64.convert(ieee)
+    original = zigpy.device.Device(app, ieee, nwk)
+    original.manufacturer, original.model = quirk.signature["models_info"][0]
+    for endpoint_id, endpoint in quirk.signature["endpoints"].items():
+        ep = original.add_endpoint(endpoint_id)
+        ep.profile_id = endpoint["profile_id"]
+        ep.device_type = endpoint["device_type"]
+    device = quirk(app, ieee, nwk, original)
+    app._devices[ieee] = device
+    return device
+
+
+def iter_clusters(device: CustomDevice) -> Iterator[Cluster]:
+    for endpoint_id, endpoint in device.endpoints.items():
+        if endpoint_id == 0:
+            continue
+        yield from endpoint.in_clusters.values()
+        yield from endpoint.out_clusters.values()
+
+
+def find_cluster(
+    device: CustomDevice, endpoint_id: int, cluster_id: int, is_server: bool
+) -> Cluster | None:
+    endpoint = device.endpoints.get(endpoint_id)
+    if endpoint is None or endpoint_id == 0:
+        return None
+    clusters = endpoint.in_clusters if is_server else endpoint.out_clusters
+    return clusters.get(cluster_id)
+
+
+def deliver(cluster: Cluster, frame: bytes) -> None:
+    """Decode a ZCL frame and hand it to the cluster like an endpoint would."""
+    hdr, args = cluster.deserialize(frame)
+    cluster.handle_message(hdr, args)
+
+
+def zcl_frame(
+    tsn: int,
+    command_id: int,
+    payload: bytes,
+    *,
+    manufacturer: int | None = None,
+    server_to_client: bool = False,
+    disable_default_response: bool = False,
+) -> bytes:
+    """Build a cluster specific ZCL frame."""
+    hdr = foundation.ZCLHeader.cluster(
+        tsn,
+        command_id,
+        manufacturer=manufacturer,
+        direction=(
+            foundation.Direction.Server_to_Client
+            if server_to_client
+            else foundation.Direction.Client_to_Server
+        ),
+    )
+    hdr.frame_control = hdr.frame_control.replace(
+        disable_default_response=disable_default_response
+    )
+    return hdr.serialize() + payload
+
+
+def read_capture(
+    path: str | pathlib.Path,
+) -> Iterator[tuple[int, t.EUI64, int, int, bool, bytes]]:
+    """Yield (timestamp ns, ieee, endpoint id, cluster id, is server, frame) records."""
+    data = pathlib.Path(path).read_bytes()
+    if not data.startswith(CAPTURE_MAGIC):
+        raise ValueError(f"{path} is not a Candeo frame capture")
+    offset = len(CAPTURE_MAGIC)
+    while offset + CAPTURE_RECORD.size <= len(data):
+        timestamp, ieee, endpoint_id, cluster_id, flags, length = (
+            CAPTURE_RECORD.unpack_from(data, offset)
+        )
+        offset += CAPTURE_RECORD.size
+        frame = data[offset : offset + length]
+        if len(frame) < length:
+            break  # truncated tail of a capture that is still being written
+        offset += length
+        yield (
+            timestamp,
+            t.EUI64.deserialize(ieee)[0],
+            endpoint_id,
+            cluster_id,
+            bool(flags & 0x01),
+            frame,
+        )
@@ -0,0 +1,115 @@
+"""Measure how long each Candeo quirk module takes to import.
+
+Usage:
+    python tools/candeo_import_time.py
+    python tools/candeo_import_time.py --repeat 10 --modules
+
+Every measurement runs in a fresh interpreter. "warm" imports all of zhaquirks
+first, as zhaquirks.setup() does before it loads custom quirks, so it is the
+cost a quirk adds to Home Assistant startup. "cold" imports the quirk into an
+otherwise empty interpreter and includes the zigpy and zhaquirks modules it
+pulls in. "classes" is the part of the warm import spent building the quirk
+and cluster classes. The quirk bytecode cache is warmed first, as it would be
+after the first start.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from candeo_harness import QUIRK_DIR, QUIRK_FILES
+
+_PROBE = r"""
+import builtins, importlib, importlib.util, json, pkgutil, sys, time
+
+path, warm = sys.argv[1], sys.argv[2] == "warm"
+if warm:
+    import zhaquirks
+
+    for _, name, _ in pkgutil.walk_packages(zhaquirks.__path__, "zhaquirks."):
+        importlib.import_module(name)
+
+build_class = builtins.__build_class__
+depth = 0
+classes_ns = 0
+
+
+def timed_build_class(*args, **kwargs):
+    global depth, classes_ns
+    depth += 1
+    start = time.perf_counter_ns()
+    try:
+        return build_class(*args, **kwargs)
+    finally:
+        depth -= 1
+        if not depth:
+            classes_ns += time.perf_counter_ns() - start
+
+
+before = set(sys.modules)
+spec = importlib.util.spec_from_file_location("candeo_import_probe", path)
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+builtins.__build_class__ = timed_build_class
+start = time.perf_counter_ns()
+spec.loader.exec_module(module)
+total_ns = time.perf_counter_ns() - start
+builtins.__build_class__ = build_class
+print(json.dumps({
+    "total_ns": total_ns,
+    "classes_ns": classes_ns,
+    "modules": sorted(set(sys.modules) - before - {spec.name}),
+}))
+"""
+
+
+def probe(path: str, mode: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE, path, mode],
+        capture_output=True,
+        check=True,
+        text=True,
+        # always use the bytecode cache, as Home Assistant does
+        env={k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"},
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--modules",
+        action="store_true",
+        help="list the modules each quirk imports on top of zhaquirks",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'quirk':<12}{'warm ms':>10}{'classes ms':>12}{'cold ms':>10}{'modules':>9}"
+    )
+    for name, filename in QUIRK_FILES.items():
+        path = str(QUIRK_DIR / filename)
+        probe(path, "cold")  # write the bytecode cache
+        warm = [probe(path, "warm") for _ in range(args.repeat)]
+        cold = [probe(path, "cold") for _ in range(args.repeat)]
+        print(
+            f"{name:<12}"
+            f"{statistics.median(r['total_ns'] for r in warm) / 1e6:>10.2f}"
+            f"{statistics.median(r['classes_ns'] for r in warm) / 1e6:>12.2f}"
+            f"{statistics.median(r['total_ns'] for r in cold) / 1e6:>10.2f}"
+            f"{len(warm[0]['modules']):>9}"
+        )
+        if args.modules:
+            for module in warm[0]["modules"]:
+                print(f"    {module}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Replay a Candeo frame capture through the quirk clusters and diff the emitted events.
+
+Usage:
+    python tools/candeo_replay.py CAPTURE --quirk candeo_modmote.py
+    python tools/candeo_replay.py CAPTURE --quirk candeo_modmote.py --against old/candeo_modmote.py
+    python tools/candeo_replay.py CAPTURE --quirk candeo_modmote.py --speed 10
+
+Captures are written by a quirk module when its CAPTURE_PATH is set. With
+--against, the capture is replayed through both quirk files and a unified
+diff of the emitted events is printed; the exit status is 1 when they differ.
+Time based behaviour (synthesized ring stops, gesture windows) follows the
+capture timestamps at any --speed, and deadlines still pending after the last
+frame are run out before the events are compared.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import difflib
+import pathlib
+import sys
+
+from candeo_harness import (
+    EventRecorder,
+    StubApplication,
+    create_device,
+    VirtualClock,
+    deliver,
+    find_cluster,
+    load_quirk,
+    quirk_classes,
+    read_capture,
+)
+
+
+async def replay(
+    capture: pathlib.Path, quirk_path: pathlib.Path, module_name: str, speed: float
+) -> list[str]:
+    """Feed every captured frame to the quirk and return the emitted events."""
+    module = load_quirk(quirk_path, module_name)
+    quirks = quirk_classes(module)
+    app = StubApplication()
+    recorder = EventRecorder()
+    clock = VirtualClock(module)
+    devices = {}
+    previous = None
+
+    for timestamp, ieee, endpoint_id, cluster_id, is_server, frame in read_capture(
+        capture
+    ):
+        if speed > 0 and previous is not None and timestamp > previous:
+            await asyncio.sleep((timestamp - previous) / 1e9 / speed)
+        previous = timestamp
+        clock.advance(timestamp / 1e9)
+
+        cluster = None
+        if ieee in devices:
+            cluster = find_cluster(devices[ieee], endpoint_id, cluster_id, is_server)
+        else:
+            for quirk in quirks:
+                device = create_device(quirk, app, ieee)
+                cluster = find_cluster(device, endpoint_id, cluster_id, is_server)
+                if cluster is not None:
+                    recorder.attach(device)
+                    devices[ieee] = device
+                    break
+        if cluster is None:
+            print(
+                f"{quirk_path.name}: no cluster for {ieee} endpoint {endpoint_id} "
+                f"cluster 0x{cluster_id:04x}, skipping frame",
+                file=sys.stderr,
+            )
+            continue
+        deliver(cluster, frame)
+        await asyncio.sleep(0)
+
+    clock.drain()
+    dispatcher = getattr(module, "_EVENT_DISPATCHER", None)
+    if dispatcher is not None:
+        await dispatcher.join()
+    return [" ".join(str(part) for part in event) for event in recorder.events]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", type=pathlib.Path)
+    parser.add_argument("--quirk", type=pathlib.Path, required=True)
+    parser.add_argument(
+        "--against",
+        type=pathlib.Path,
+        help="second quirk file to replay the capture through and diff against",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="1 replays at the original pace, 10 ten times faster, 0 (default) "
+        "as fast as possible",
+    )
+    args = parser.parse_args()
+
+    events = asyncio.run(
+        replay(args.capture, args.quirk, "candeo_replay_quirk", args.speed)
+    )
+    if args.against is None:
+        print("\n".join(events))
+        return 0
+
+    baseline = asyncio.run(
+        replay(args.capture, args.against, "candeo_replay_against", args.speed)
+    )
+    diff = list(
+        difflib.unified_diff(
+            baseline,
+            events,
+            fromfile=str(args.against),
+            tofile=str(args.quirk),
+            lineterm="",
+        )
+    )
+    print("\n".join(diff) if diff else f"{len(events)} events, no differences")
+    return 1 if diff else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
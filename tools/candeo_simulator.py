@@ -0,0 +1,293 @@
+"""Simulate many Candeo devices with synthetic traffic and report throughput, latency and memory.
+
+Usage:
+    python tools/candeo_simulator.py --rotary 1000 --modmote 1000 --irrigation 1000
+    python tools/candeo_simulator.py --rotary 5000 --frames 50 --json
+
+Every device runs against a stub application, so no radio is needed. Traffic
+is synthetic but follows what the devices send: ring spins with varied click
+counts, button mashing, Modmote presses and mode flips, and valve cycles with
+Tuya data point reports. Frames are interleaved round-robin across devices.
+The quirk timer wheels run on a virtual clock that moves --frame-interval
+seconds per round, so idle stops and gestures do not depend on how fast the
+simulation runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+from array import array
+import asyncio
+from collections.abc import Callable, Iterator
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    EventRecorder,
+    StubApplication,
+    VirtualClock,
+    create_device,
+    deliver,
+    load_quirk,
+    zcl_frame,
+)
+import zigpy.types as t
+from zigpy.zcl import Cluster, foundation
+
+ROTARY_MANUFACTURER = 0x1234
+MODMOTE_MANUFACTURER = 0x1002
+
+Traffic = Iterator[tuple[Cluster, bytes]]
+
+
+def rotary_traffic(device: Any, rng: random.Random) -> Traffic:
+    """Ring spins with 1-20 clicks per frame, mixed with button mashing."""
+    cluster = device.endpoints[1].in_clusters[0xFF03]
+    tsn = 0
+
+    def frame(*fields: int) -> tuple[Cluster, bytes]:
+        nonlocal tsn
+        tsn = (tsn + 1) & 0xFF
+        return cluster, zcl_frame(
+            tsn, 0x01, bytes(fields), manufacturer=ROTARY_MANUFACTURER
+        )
+
+    while True:
+        if rng.random() < 0.6:
+            direction = rng.choice((0x01, 0x02))
+            yield frame(0x03, direction, 0x01, rng.randint(1, 20))
+            for _ in range(rng.randint(0, 8)):
+                yield frame(0x03, direction, 0x03, rng.randint(1, 20))
+            yield frame(0x03, direction, 0x02, 0x00)
+        else:
+            for _ in range(rng.randint(1, 8)):
+                button = rng.choice((0x01, 0x02, 0x04, 0x08, 0x10))
+                if rng.random() < 0.2:
+                    yield frame(0x01, 0x00, button, 0x03)
+                    yield frame(0x01, 0x00, button, 0x04)
+                else:
+                    yield frame(0x01, 0x00, button, rng.choice((0x01, 0x02)))
+
+
+def modmote_traffic(device: Any, rng: random.Random) -> Traffic:
+    """Presses on all four endpoints with the odd flip back into command mode."""
+    tsn = 0
+
+    def next_tsn() -> int:
+        nonlocal tsn
+        tsn = (tsn + 1) & 0xFF
+        return tsn
+
+    while True:
+        if rng.random() < 0.05:
+            # the device fell back to command mode: an on/off command, then a
+            # switch_mode report once the quirk reads the mode back
+            yield device.endpoints[1].out_clusters[0x0006], zcl_frame(
+                next_tsn(), 0x01, b""
+            )
+            report = foundation.ZCLHeader.general(
+                next_tsn(), foundation.GeneralCommand.Report_Attributes
+            )
+            yield device.endpoints[1].in_clusters[0x0006], report.serialize() + bytes(
+                (0x04, 0x80, 0x30, rng.choice((0x00, 0x01)))
+            )
+        else:
+            endpoint_id = rng.randint(1, 4)
+            yield device.endpoints[endpoint_id].out_clusters[0x0006], zcl_frame(
+                next_tsn(),
+                0xFD,
+                bytes((rng.choice((0x00, 0x00, 0x00, 0x01, 0x02)),)),
+                manufacturer=MODMOTE_MANUFACTURER,
+            )
+
+
+def _tuya_datapoint(dp: int, dp_type: int, value: int) -> bytes:
+    data = value.to_bytes(4 if dp_type == 0x02 else 1, "big")
+    return bytes((dp, dp_type)) + len(data).to_bytes(2, "big") + data
+
+
+def irrigation_traffic(device: Any, rng: random.Random) -> Traffic:
+    """Valve open/close cycles with timer, water usage and battery reports."""
+    cluster = device.endpoints[1].in_clusters[0xEF00]
+    tsn = 0
+    battery = 50
+
+    def report(*datapoints: bytes) -> tuple[Cluster, bytes]:
+        nonlocal tsn
+        tsn = (tsn + 1) & 0xFF
+        payload = bytes((0x00, tsn)) + b"".join(datapoints)
+        return cluster, zcl_frame(tsn, 0x02, payload, server_to_client=True)
+
+    while True:
+        duration = rng.randint(60, 3600)
+        yield report(
+            _tuya_datapoint(1, 0x01, 1),
+            _tuya_datapoint(12, 0x04, 1),
+            _tuya_datapoint(11, 0x02, duration),
+        )
+        for remaining in range(duration, 0, -rng.randint(300, 900)):
+            yield report(_tuya_datapoint(11, 0x02, remaining))
+        yield report(
+            _tuya_datapoint(1, 0x01, 0),
+            _tuya_datapoint(12, 0x04, 0),
+            _tuya_datapoint(15, 0x02, duration),
+        )
+        yield report(
+            _tuya_datapoint(5, 0x02, rng.randint(0, 999)),
+            _tuya_datapoint(6, 0x02, rng.randint(0, 500)),
+        )
+        if rng.random() < 0.3:
+            battery = max(battery - 1, 0)
+            yield report(_tuya_datapoint(7, 0x02, battery))
+
+
+SCENARIOS: dict[str, tuple[str, Callable[[Any, random.Random], Traffic]]] = {
+    "rotary": ("CandeoCZBSR5BRSceneSwitchRemote", rotary_traffic),
+    "modmote": ("CandeoModmote", modmote_traffic),
+    "irrigation": ("CandeoSmartIrrigationTimer", irrigation_traffic),
+}
+
+
+def percentile(ordered: array, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] / 1000
+
+
+async def simulate(
+    counts: dict[str, int],
+    frames: int,
+    seed: int,
+    duplicate_rate: float,
+    frame_interval: float,
+) -> dict[str, Any]:
+    """Create the devices, drive the traffic and collect the report."""
+    rng = random.Random(seed)
+    app = StubApplication()
+    recorder = EventRecorder(keep=False)
+    report: dict[str, Any] = {}
+
+    for name, count in counts.items():
+        if not count:
+            continue
+        class_name, traffic = SCENARIOS[name]
+        module = load_quirk(QUIRK_DIR / QUIRK_FILES[name])
+        quirk = getattr(module, class_name)
+        clock = VirtualClock(module)
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        devices = []
+        for index in range(count):
+            ieee = t.EUI64((0x10000 * (len(report) + 1) + index).to_bytes(8, "little"))
+            devices.append(create_device(quirk, app, ieee, nwk=index & 0xFFF7))
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        for device in devices:
+            recorder.attach(device)
+
+        streams = [traffic(device, random.Random(rng.random())) for device in devices]
+        latencies = array("Q")
+        events_before = recorder.count
+        started = time.perf_counter()
+        for round_number in range(frames):
+            clock.advance(round_number * frame_interval)
+            for stream in streams:
+                cluster, frame = next(stream)
+                repeat = 2 if rng.random() < duplicate_rate else 1
+                for _ in range(repeat):
+                    frame_start = time.perf_counter_ns()
+                    deliver(cluster, frame)
+                    latencies.append(time.perf_counter_ns() - frame_start)
+            # let default responses and other tasks spawned by the quirks run
+            await asyncio.sleep(0)
+        clock.drain()
+        await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+
+        ordered = array("Q", sorted(latencies))
+        events = recorder.count - events_before
+        report[name] = {
+            "devices": count,
+            "frames": len(latencies),
+            "events": events,
+            "seconds": round(elapsed, 3),
+            "frames_per_second": round(len(latencies) / elapsed),
+            "events_per_second": round(events / elapsed),
+            "latency_us": {
+                "p50": percentile(ordered, 0.50),
+                "p90": percentile(ordered, 0.90),
+                "p99": percentile(ordered, 0.99),
+                "max": ordered[-1] / 1000 if ordered else 0.0,
+            },
+            "memory_per_device_bytes": round((after - before) / count),
+        }
+
+    report["requests_sent"] = app.requests_sent
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rotary", type=int, default=1000)
+    parser.add_argument("--modmote", type=int, default=1000)
+    parser.add_argument("--irrigation", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=20, help="frames per device")
+    parser.add_argument(
+        "--duplicate-rate",
+        type=float,
+        default=0.02,
+        help="fraction of frames delivered twice, as retransmissions would be",
+    )
+    parser.add_argument(
+        "--frame-interval",
+        type=float,
+        default=0.5,
+        help="virtual seconds between two frames of one device",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    counts = {
+        "rotary": args.rotary,
+        "modmote": args.modmote,
+        "irrigation": args.irrigation,
+    }
+    report = asyncio.run(
+        simulate(
+            counts, args.frames, args.seed, args.duplicate_rate, args.frame_interval
+        )
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(
+        f"{'quirk':<12}{'devices':>9}{'frames':>10}{'events':>10}{'frames/s':>11}"
+        f"{'events/s':>11}{'p50 us':>9}{'p90 us':>9}{'p99 us':>9}{'max us':>10}"
+        f"{'bytes/dev':>11}"
+    )
+    for name in counts:
+        if name not in report:
+            continue
+        row = report[name]
+        latency = row["latency_us"]
+        print(
+            f"{name:<12}{row['devices']:>9}{row['frames']:>10}{row['events']:>10}"
+            f"{row['frames_per_second']:>11}{row['events_per_second']:>11}"
+            f"{latency['p50']:>9.1f}{latency['p90']:>9.1f}{latency['p99']:>9.1f}"
+            f"{latency['max']:>10.1f}{row['memory_per_device_bytes']:>11}"
+        )
+    print(f"requests sent to the stub application: {report['requests_sent']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Battery drain fit and time-to-empty estimate of the irrigation timer.
+
+Usage:
+    python -m pytest tools/test_candeo_battery.py
+"""
+
+from __future__ import annotations
+
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    StubApplication,
+    create_device,
+    load_quirk,
+)
+
+START = 1_700_000_000.0
+HOUR = 3600.0
+# hours between the readings fed in, one BATTERY_HISTORY_INTERVAL
+STEP = 6.0
+INVALID = 0xFFFFFFFF
+
+
+@pytest.fixture(scope="module")
+def module() -> ModuleType:
+    return load_quirk(QUIRK_DIR / QUIRK_FILES["irrigation"])
+
+
+def drain(
+    trend: Any,
+    readings: int,
+    start_level: float,
+    per_hour: float,
+    first_hour: float = 0.0,
+) -> float:
+    """feed one reading per history interval, return the hour of the last one."""
+    for index in range(readings):
+        hours = index * STEP
+        trend.add(START + (first_hour + hours) * HOUR, start_level - per_hour * hours)
+    return first_hour + (readings - 1) * STEP
+
+
+def test_step_is_one_history_interval(module: ModuleType) -> None:
+    assert module.BATTERY_HISTORY_INTERVAL == STEP * HOUR
+
+
+def test_linear_drain_estimate(module: ModuleType) -> None:
+    trend = module._CandeoBatteryTrend(module.BATTERY_HISTORY_SIZE)
+    hours = drain(trend, 10, 90.0, 0.25)
+    level = 90.0 - 0.25 * hours
+    assert trend.drain_rate() == pytest.approx(0.25, rel=1e-4)
+    assert trend.time_to_empty() == pytest.approx(level / 0.25 * HOUR, rel=1e-3)
+
+
+def test_fit_covers_only_the_retained_readings(module: ModuleType) -> None:
+    size = module.BATTERY_HISTORY_SIZE
+    trend = module._CandeoBatteryTrend(size)
+    # a faster drain first, pushed out of the history by a slower one
+    hours = drain(trend, size, 95.0, 0.2)
+    drain(trend, size, 95.0 - 0.2 * hours, 0.01, first_hour=hours + STEP)
+    assert trend.count == size
+    assert trend.drain_rate() == pytest.approx(0.01, rel=1e-2)
+
+
+def test_readings_within_an_interval_only_move_the_level(module: ModuleType) -> None:
+    trend = module._CandeoBatteryTrend(module.BATTERY_HISTORY_SIZE)
+    hours = drain(trend, 10, 90.0, 0.25)
+    count, rate = trend.count, trend.drain_rate()
+    assert trend.add(START + (hours + 1) * HOUR, 70.0)
+    assert not trend.add(START + (hours + 2) * HOUR, 70.0)
+    assert (trend.count, trend.drain_rate()) == (count, rate)
+    assert trend.time_to_empty() == pytest.approx(70.0 / rate * HOUR, rel=1e-6)
+
+
+def test_battery_replacement_starts_over(module: ModuleType) -> None:
+    trend = module._CandeoBatteryTrend(module.BATTERY_HISTORY_SIZE)
+    hours = drain(trend, 10, 90.0, 0.25)
+    level = 90.0 - 0.25 * hours
+    trend.add(START + (hours + STEP) * HOUR, level + module.BATTERY_REPLACED_RISE)
+    assert trend.count == 1
+    assert trend.time_to_empty() is None
+
+
+@pytest.mark.parametrize(
+    ("readings", "per_hour"),
+    [(2, 0.25), (10, 0.0), (10, -0.1)],
+    ids=["too_few", "flat", "rising"],
+)
+def test_no_estimate(module: ModuleType, readings: int, per_hour: float) -> None:
+    trend = module._CandeoBatteryTrend(module.BATTERY_HISTORY_SIZE)
+    drain(trend, readings, 80.0, per_hour)
+    assert trend.time_to_empty() is None
+
+
+def test_snapshot_restore_gives_the_same_estimate(module: ModuleType) -> None:
+    size = module.BATTERY_HISTORY_SIZE
+    trend = module._CandeoBatteryTrend(size)
+    # wrap the ring so the snapshot has to put the readings back in order
+    drain(trend, size + 7, 99.0, 0.05)
+    restored = module._CandeoBatteryTrend(size)
+    assert restored.restore(trend.snapshot())
+    assert restored.count == trend.count
+    assert restored.drain_rate() == pytest.approx(trend.drain_rate(), rel=1e-4)
+    assert restored.time_to_empty() == pytest.approx(trend.time_to_empty(), rel=1e-4)
+
+
+@pytest.mark.parametrize(
+    "snapshot",
+    [[0.0, [1.0, 2.0], [3.0]], [0.0, [1.0], ["x"]], "bad", [True, [], []]],
+)
+def test_malformed_snapshot_is_refused(module: ModuleType, snapshot: Any) -> None:
+    assert not module._CandeoBatteryTrend(4).restore(snapshot)
+
+
+def test_time_to_empty_attribute(
+    module: ModuleType, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    device = create_device(
+        module.CandeoSmartIrrigationTimer,
+        StubApplication(),
+        "00:00:00:00:00:00:08:01",
+    )
+    power = device.endpoints[1].power
+    now = [START]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+
+    def report(hours: float, level: int) -> Any:
+        now[0] = START + hours * HOUR
+        power._update_attribute(0x0021, level)
+        return power._attr_cache.get(0xEF00)
+
+    assert report(0, 90) == INVALID
+    assert report(6, 89) == INVALID
+    estimate = report(12, 88)
+    assert estimate != INVALID
+    assert estimate == pytest.approx(88 / (1 / 6) * HOUR, rel=1e-3)
+    assert power._attr_cache[0x0021] == 176
+    # new batteries: the old estimate must not linger
+    assert report(18, 100) == INVALID
@@ -0,0 +1,205 @@
+"""Overflow policies of the optional event dispatch queue.
+
+Usage:
+    python -m pytest tools/test_candeo_dispatch.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterator
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    EventRecorder,
+    StubApplication,
+    VirtualClock,
+    create_device,
+    deliver,
+    load_quirk,
+    zcl_frame,
+)
+
+STARTED = "started_rotating_right"
+CONTINUED = "continued_rotating_right"
+STOPPED = "stopped_rotating_right"
+BUTTON = "button_1_short_press"
+RIGHT = 0x01
+RING_STARTED = 0x01
+RING_STOPPED = 0x02
+RING_CONTINUED = 0x03
+
+
+def load_dispatching(quirk: str, policy: str, maxsize: int) -> ModuleType:
+    return load_quirk(
+        QUIRK_DIR / QUIRK_FILES[quirk],
+        f"candeo_{quirk}_{policy}",
+        {
+            "EVENT_DISPATCH_ENABLED": True,
+            "EVENT_DISPATCH_QUEUE_SIZE": maxsize,
+            "EVENT_DISPATCH_OVERFLOW": policy,
+        },
+    )
+
+
+@pytest.fixture(scope="module")
+def modules() -> dict[str, ModuleType]:
+    return {
+        quirk: load_dispatching(quirk, "drop_oldest", 3)
+        for quirk in ("rotary", "modmote")
+    }
+
+
+class FakeCluster:
+    """Stands in for a cluster, keeping the events handed to its listeners."""
+
+    def __init__(self) -> None:
+        self.events: list[str] = []
+
+    def listener_event(self, method: str, event: str, *args: Any) -> None:
+        self.events.append(event)
+
+
+def overflow(
+    module: ModuleType, policy: str, events: list[str]
+) -> tuple[Any, list[str]]:
+    """dispatch events into a queue of 3 without yielding, then let it drain."""
+    cluster = FakeCluster()
+
+    async def run() -> Any:
+        dispatcher = module._CandeoEventDispatcher(
+            3, policy, module._EVENT_DISPATCHER.droppable
+        )
+        for event in events:
+            dispatcher.dispatch(cluster, event)
+        await dispatcher.join()
+        return dispatcher
+
+    dispatcher = asyncio.run(run())
+    return dispatcher, cluster.events
+
+
+ROTATION = [STARTED, CONTINUED, CONTINUED, CONTINUED, STOPPED]
+PRESSES = ["press_1", "press_2", "press_3", "press_3", "press_3", "press_4"]
+
+
+@pytest.mark.parametrize(
+    ("quirk", "policy", "events", "delivered", "dropped", "merged", "inline"),
+    [
+        # only continued_ events may go, the rest of the rotation survives
+        ("rotary", "drop_oldest", ROTATION, [STARTED, CONTINUED, STOPPED], 2, 0, 0),
+        (
+            "rotary",
+            "merge_rotation",
+            ROTATION,
+            [STARTED, CONTINUED, CONTINUED, STOPPED],
+            1,
+            1,
+            0,
+        ),
+        ("rotary", "deliver_oldest", ROTATION, ROTATION, 0, 0, 2),
+        # nothing droppable is queued: the newcomer is dropped, or the oldest
+        # entry delivered to make room for a stop
+        (
+            "rotary",
+            "drop_oldest",
+            [STARTED, BUTTON, BUTTON, CONTINUED, STOPPED],
+            [STARTED, BUTTON, BUTTON, STOPPED],
+            1,
+            0,
+            1,
+        ),
+        # every Modmote press is droppable
+        (
+            "modmote",
+            "drop_oldest",
+            PRESSES,
+            ["press_3", "press_3", "press_4"],
+            3,
+            0,
+            0,
+        ),
+        (
+            "modmote",
+            "merge_rotation",
+            PRESSES,
+            ["press_2", "press_3", "press_3", "press_3", "press_4"],
+            1,
+            2,
+            0,
+        ),
+        ("modmote", "deliver_oldest", PRESSES, PRESSES, 0, 0, 3),
+    ],
+)
+def test_overflow_policy(
+    modules: dict[str, ModuleType],
+    quirk: str,
+    policy: str,
+    events: list[str],
+    delivered: list[str],
+    dropped: int,
+    merged: int,
+    inline: int,
+) -> None:
+    dispatcher, events = overflow(modules[quirk], policy, events)
+    assert events == delivered
+    assert (dispatcher.dropped, dispatcher.merged) == (dropped, merged)
+    assert dispatcher.delivered_inline == inline
+    assert not dispatcher._queue
+
+
+def test_unknown_policy_is_refused(modules: dict[str, ModuleType]) -> None:
+    with pytest.raises(ValueError):
+        modules["modmote"]._CandeoEventDispatcher(3, "drop_newest", ("",))
+
+
+@pytest.fixture
+def merging_rotary() -> Iterator[tuple[ModuleType, VirtualClock]]:
+    module = load_dispatching("rotary", "merge_rotation", 2)
+    clock = VirtualClock(module)
+    yield module, clock
+    clock.drain()
+
+
+def test_ring_frames_past_capacity(
+    merging_rotary: tuple[ModuleType, VirtualClock],
+) -> None:
+    module, clock = merging_rotary
+    device = create_device(
+        module.CandeoCZBSR5BRSceneSwitchRemote,
+        StubApplication(),
+        "00:00:00:00:00:00:09:01",
+    )
+    cluster = device.endpoints[1].in_clusters[0xFF03]
+    recorder = EventRecorder()
+    recorder.attach(device)
+
+    async def ring(actions: list[int]) -> None:
+        for tsn, action in enumerate(actions, 1):
+            clock.advance(tsn * 0.1)
+            deliver(
+                cluster,
+                zcl_frame(
+                    tsn,
+                    0x01,
+                    bytes((0x03, RIGHT, action, 1)),
+                    manufacturer=0x1234,
+                    disable_default_response=True,
+                ),
+            )
+        await module._EVENT_DISPATCHER.join()
+
+    # the first stop arms the remote and sends no event
+    asyncio.run(
+        ring([RING_STOPPED, RING_STARTED] + [RING_CONTINUED] * 3 + [RING_STOPPED])
+    )
+    events = [command for *_, kind, command, _ in recorder.events if kind == "event"]
+    # the merged continued_ entry gives way to the stop as a whole
+    assert events == [STARTED, STOPPED]
+    assert module._EVENT_DISPATCHER.merged == 2
+    assert module._EVENT_DISPATCHER.dropped == 3
@@ -0,0 +1,136 @@
+"""Behaviour of the Modmote gesture table, run on a virtual clock.
+
+Usage:
+    python -m pytest tools/test_candeo_gestures.py
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from types import ModuleType
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    EventRecorder,
+    StubApplication,
+    VirtualClock,
+    create_device,
+    load_quirk,
+)
+
+SHORT = 0x00
+DOUBLE = 0x01
+LONG = 0x02
+
+
+@pytest.fixture(scope="module")
+def module() -> ModuleType:
+    return load_quirk(QUIRK_DIR / QUIRK_FILES["modmote"])
+
+
+@pytest.fixture
+def clock(module: ModuleType) -> Iterator[VirtualClock]:
+    clock = VirtualClock(module)
+    yield clock
+    clock.drain()
+
+
+class Remote:
+    """One Modmote fed with decoded presses at virtual times."""
+
+    def __init__(self, module: ModuleType, clock: VirtualClock) -> None:
+        self.clock = clock
+        self.device = create_device(
+            module.CandeoModmote, StubApplication(), "00:00:00:00:00:00:04:01"
+        )
+        self.recorder = EventRecorder()
+        self.recorder.attach(self.device)
+
+    def press(self, at: float, button: int, press_type: int = SHORT) -> None:
+        self.clock.advance(at)
+        self.device.gestures.press(button, press_type)
+
+    def events(self) -> list[tuple[int, str]]:
+        return [
+            (endpoint_id, command)
+            for _, endpoint_id, _, kind, command, _ in self.recorder.events
+            if kind == "event"
+        ]
+
+
+@pytest.fixture
+def remote(module: ModuleType, clock: VirtualClock) -> Remote:
+    return Remote(module, clock)
+
+
+def test_triple_press(module: ModuleType, remote: Remote) -> None:
+    remote.press(1.0, 2, DOUBLE)
+    remote.press(1.3, 2, SHORT)
+    assert remote.events() == [(2, module.TRIPLE_PRESS)]
+
+
+def test_two_double_presses_are_not_a_triple(remote: Remote) -> None:
+    remote.press(1.0, 2, DOUBLE)
+    remote.press(1.3, 2, DOUBLE)
+    remote.press(1.6, 2, SHORT)
+    assert remote.events() == []
+
+
+def test_triple_press_needs_one_window(remote: Remote) -> None:
+    remote.press(1.0, 2, DOUBLE)
+    remote.press(2.0, 2, SHORT)
+    assert remote.events() == []
+
+
+def test_chord(remote: Remote) -> None:
+    remote.press(1.0, 4)
+    remote.press(1.1, 2)
+    assert remote.events() == [(1, "chord_2_4")]
+
+
+def test_presses_outside_chord_window_are_no_chord(remote: Remote) -> None:
+    remote.press(1.0, 4)
+    remote.press(1.5, 2)
+    assert remote.events() == []
+
+
+def test_sequence_fires_when_window_closes(remote: Remote) -> None:
+    # (1, 2) is also the start of (1, 2, 3, 4), so it waits for the window
+    remote.press(1.0, 1)
+    remote.press(1.5, 2)
+    assert remote.events() == []
+    remote.clock.advance(2.2)
+    assert remote.events() == []
+    remote.clock.advance(2.4)
+    assert remote.events() == [(1, "sequence_1_2")]
+
+
+def test_long_sequence_fires_on_last_press(remote: Remote) -> None:
+    for offset, button in enumerate((1, 2, 3, 4)):
+        remote.press(1.0 + offset * 0.5, button)
+    assert remote.events() == [(1, "sequence_1_2_3_4")]
+    remote.clock.drain()
+    assert remote.events() == [(1, "sequence_1_2_3_4")]
+
+
+def test_sequence_window_expiry(remote: Remote) -> None:
+    remote.press(1.0, 1)
+    remote.press(2.0, 2)
+    remote.clock.drain()
+    assert remote.events() == []
+
+
+def test_long_press_cancels_sequence(remote: Remote) -> None:
+    remote.press(1.0, 1)
+    remote.press(1.5, 2, LONG)
+    remote.clock.drain()
+    assert remote.events() == []
+
+
+def test_sequence_that_cannot_grow_fires_at_once(remote: Remote) -> None:
+    remote.press(1.0, 3)
+    remote.press(1.5, 4)
+    assert remote.events() == [(1, "sequence_3_4")]
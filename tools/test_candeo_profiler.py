@@ -0,0 +1,96 @@
+"""Self time and awaited calls in the opt-in handler profiler.
+
+Usage:
+    python -m pytest tools/test_candeo_profiler.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    StubApplication,
+    create_device,
+    deliver,
+    load_quirk,
+    zcl_frame,
+)
+
+SLOW_SECONDS = 0.02
+
+
+@pytest.fixture
+def rotary() -> ModuleType:
+    return load_quirk(
+        QUIRK_DIR / QUIRK_FILES["rotary"],
+        "candeo_rotary_profiled",
+        {"PROFILE_ENABLED": True, "PROFILE_LOG_INTERVAL": 0},
+    )
+
+
+def remote_cluster(module: ModuleType) -> Any:
+    device = create_device(
+        module.CandeoCZBSR5BRSceneSwitchRemote,
+        StubApplication(),
+        "00:00:00:00:00:00:05:01",
+    )
+    return device.endpoints[1].in_clusters[0xFF03]
+
+
+class SlowListener:
+    """Listener that keeps every event for SLOW_SECONDS."""
+
+    def zha_send_event(self, *args: Any) -> None:
+        time.sleep(SLOW_SECONDS)
+
+
+def test_self_time_leaves_out_nested_calls(rotary: ModuleType) -> None:
+    cluster = remote_cluster(rotary)
+    cluster.add_listener(SlowListener())
+    # a button press: handle_message -> handle_cluster_request -> listener_event
+    deliver(
+        cluster,
+        zcl_frame(
+            1,
+            0x01,
+            bytes((0x01, 0x00, 0x01, 0x01)),
+            manufacturer=0x1234,
+            disable_default_response=True,
+        ),
+    )
+    profile = rotary.dump_profile()
+    name = "CandeoCZBSR5BRSceneSwitchRemoteCluster"
+    listener = profile[f"{name}.listener_event"]
+    request = profile[f"{name}.handle_cluster_request"]
+    message = profile[f"{name}.handle_message"]
+    slow_us = SLOW_SECONDS * 1e6
+    assert listener["self_mean_us"] == listener["mean_us"] >= slow_us
+    assert request["mean_us"] >= slow_us and message["mean_us"] >= slow_us
+    assert request["self_mean_us"] < slow_us / 2
+    assert message["self_mean_us"] < slow_us / 2
+    assert message["self_mean_us"] < message["mean_us"] - request["mean_us"] + 1
+
+
+def test_awaitable_returned_by_plain_def_is_timed_to_completion(
+    rotary: ModuleType,
+) -> None:
+    cluster = remote_cluster(rotary)
+
+    async def slow_bind(**kwargs: Any) -> list[Any]:
+        await asyncio.sleep(SLOW_SECONDS)
+        return [0]
+
+    # zigpy's Cluster.bind is a plain def returning this coroutine
+    cluster.endpoint.device.zdo.bind = slow_bind
+    assert asyncio.run(cluster.bind()) == [0]
+    bind = rotary.dump_profile()["CandeoCZBSR5BRSceneSwitchRemoteCluster.bind"]
+    assert bind["sampled_calls"] == 1
+    assert bind["mean_us"] >= SLOW_SECONDS * 1e6
+    assert bind["self_mean_us"] == 0
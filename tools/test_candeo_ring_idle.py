@@ -0,0 +1,137 @@
+"""Synthesized ring stops of the rotary remote, run on a virtual clock.
+
+Usage:
+    python -m pytest tools/test_candeo_ring_idle.py
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from types import ModuleType
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    EventRecorder,
+    StubApplication,
+    VirtualClock,
+    create_device,
+    deliver,
+    load_quirk,
+    zcl_frame,
+)
+
+RIGHT = 0x01
+STARTED = 0x01
+STOPPED = 0x02
+CONTINUED = 0x03
+
+
+@pytest.fixture(scope="module")
+def module() -> ModuleType:
+    return load_quirk(QUIRK_DIR / QUIRK_FILES["rotary"])
+
+
+@pytest.fixture
+def clock(module: ModuleType) -> Iterator[VirtualClock]:
+    clock = VirtualClock(module)
+    yield clock
+    clock.drain()
+
+
+class Remote:
+    """One rotary remote fed with ring frames at virtual times."""
+
+    def __init__(self, module: ModuleType, clock: VirtualClock) -> None:
+        self.module = module
+        self.clock = clock
+        device = create_device(
+            module.CandeoCZBSR5BRSceneSwitchRemote,
+            StubApplication(),
+            "00:00:00:00:00:00:07:01",
+        )
+        self.cluster = device.endpoints[1].in_clusters[0xFF03]
+        self.recorder = EventRecorder()
+        self.recorder.attach(device)
+        self.tsn = 0
+
+    def ring(self, at: float, action: int, clicks: int = 1) -> None:
+        self.clock.advance(at)
+        self.tsn += 1
+        deliver(
+            self.cluster,
+            zcl_frame(
+                self.tsn,
+                0x01,
+                bytes((0x03, RIGHT, action, clicks)),
+                manufacturer=0x1234,
+                disable_default_response=True,
+            ),
+        )
+
+    def events(self) -> list[str]:
+        return [
+            command
+            for _, _, _, kind, command, _ in self.recorder.events
+            if kind == "event"
+        ]
+
+    def counter(self, name: str) -> int:
+        return self.cluster.diagnostics()[name]
+
+
+@pytest.fixture
+def remote(module: ModuleType, clock: VirtualClock) -> Remote:
+    remote = Remote(module, clock)
+    # the remote ignores rotations until it has seen a stop frame
+    remote.ring(0.0, STOPPED)
+    return remote
+
+
+def test_idle_timeout_emits_one_stop(module: ModuleType, remote: Remote) -> None:
+    remote.ring(1.0, STARTED)
+    remote.ring(1.5, CONTINUED)
+    remote.clock.advance(1.5 + module.RING_IDLE_TIMEOUT - 0.1)
+    assert remote.events() == ["started_rotating_right", "continued_rotating_right"]
+    remote.clock.advance(1.5 + module.RING_IDLE_TIMEOUT + 0.1)
+    remote.clock.drain()
+    assert remote.events() == [
+        "started_rotating_right",
+        "continued_rotating_right",
+        "stopped_rotating_right",
+    ]
+    assert remote.counter("stops_synthesized") == 1
+
+
+def test_late_device_stop_is_ignored(remote: Remote) -> None:
+    remote.ring(1.0, STARTED)
+    remote.clock.advance(3.0)
+    remote.ring(3.5, STOPPED)
+    assert remote.events() == ["started_rotating_right", "stopped_rotating_right"]
+    assert remote.counter("late_stops_ignored") == 1
+
+
+def test_new_rotation_clears_synthesized_stop(remote: Remote) -> None:
+    remote.ring(1.0, STARTED)
+    remote.clock.advance(3.0)
+    remote.ring(4.0, STARTED)
+    remote.ring(4.2, STOPPED)
+    remote.clock.drain()
+    assert remote.events() == [
+        "started_rotating_right",
+        "stopped_rotating_right",
+        "started_rotating_right",
+        "stopped_rotating_right",
+    ]
+    assert remote.counter("stops_synthesized") == 1
+    assert remote.counter("late_stops_ignored") == 0
+
+
+def test_device_stop_in_time_cancels_the_deadline(remote: Remote) -> None:
+    remote.ring(1.0, STARTED)
+    remote.ring(1.2, STOPPED)
+    remote.clock.drain()
+    assert remote.events() == ["started_rotating_right", "stopped_rotating_right"]
+    assert remote.counter("stops_synthesized") == 0
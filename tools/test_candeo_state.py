@@ -0,0 +1,109 @@
+"""Restoring the persisted state snapshots, good and malformed.
+
+Usage:
+    python -m pytest tools/test_candeo_state.py
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import pathlib
+from types import ModuleType
+from typing import Any
+
+import pytest
+
+from candeo_harness import (
+    QUIRK_DIR,
+    QUIRK_FILES,
+    StubApplication,
+    create_device,
+    load_quirk,
+)
+
+ROTARY_IEEE = "00:00:00:00:00:00:06:01"
+MODMOTE_IEEE = "00:00:00:00:00:00:06:02"
+
+
+def load_with_state(tmp_path: pathlib.Path, quirk: str, states: Any) -> ModuleType:
+    path = tmp_path / f"{quirk}.json"
+    path.write_text(json.dumps(states))
+    return load_quirk(
+        QUIRK_DIR / QUIRK_FILES[quirk],
+        f"candeo_{quirk}_state",
+        {"STATE_PATH": str(path)},
+    )
+
+
+def rotary_cluster(module: ModuleType) -> Any:
+    device = create_device(
+        module.CandeoCZBSR5BRSceneSwitchRemote, StubApplication(), ROTARY_IEEE
+    )
+    return device.endpoints[1].in_clusters[0xFF03]
+
+
+def test_rotary_state_is_restored(tmp_path: pathlib.Path) -> None:
+    module = load_with_state(
+        tmp_path, "rotary", {ROTARY_IEEE: ["rotating_left", "continued_"]}
+    )
+    cluster = rotary_cluster(module)
+    assert cluster.previous_direction == "rotating_left"
+    # a rotation cannot still be running after a restart
+    assert cluster.previous_rotation_event == "stopped_"
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        ["rotating_sideways", "stopped_"],
+        ["rotating_left", "garbage_"],
+        ["rotating_left"],
+        ["rotating_left", "stopped_", "extra"],
+        {"direction": "rotating_left"},
+        [1, 2],
+    ],
+)
+def test_malformed_rotary_state_is_ignored(
+    tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture, state: Any
+) -> None:
+    module = load_with_state(tmp_path, "rotary", {ROTARY_IEEE: state})
+    with caplog.at_level(logging.WARNING):
+        cluster = rotary_cluster(module)
+    assert cluster.previous_direction == "unknown"
+    assert cluster.previous_rotation_event == "unknown"
+    assert "ignoring malformed state" in caplog.text
+
+
+@pytest.mark.parametrize(
+    ("state", "mode", "warned"),
+    [
+        ("command", "command", False),
+        ("event", "event", False),
+        ("garbage", "unknown", True),
+        (5, "unknown", True),
+        (["event"], "unknown", True),
+    ],
+)
+def test_modmote_mode_is_checked(
+    tmp_path: pathlib.Path,
+    caplog: pytest.LogCaptureFixture,
+    state: Any,
+    mode: str,
+    warned: bool,
+) -> None:
+    module = load_with_state(tmp_path, "modmote", {f"{MODMOTE_IEEE}/2/out": state})
+    with caplog.at_level(logging.WARNING):
+        device = create_device(module.CandeoModmote, StubApplication(), MODMOTE_IEEE)
+    assert device.endpoints[2].out_clusters[0x0006].mode == mode
+    assert device.endpoints[1].in_clusters[0x0006].mode == "unknown"
+    assert ("ignoring malformed state" in caplog.text) == warned
+
+
+def test_state_file_that_is_not_an_object_is_ignored(
+    tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    with caplog.at_level(logging.WARNING):
+        module = load_with_state(tmp_path, "rotary", [ROTARY_IEEE])
+    assert rotary_cluster(module).previous_direction == "unknown"
+    assert "ignoring malformed state" in caplog.text